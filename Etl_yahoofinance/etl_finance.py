@@ -1,36 +1,317 @@
 # Importação de Bibliotecas
 import os
+import sys
+import json
+import sqlite3
+import time
+import random
+import threading
+import numpy as np
 import pandas as pd
 import yfinance as yf
 import gspread
+from concurrent.futures import ThreadPoolExecutor
 from google.oauth2.service_account import Credentials
-from datetime import datetime
+from datetime import datetime, timedelta
 from dateutil.relativedelta import relativedelta
 
-def obter_tickers_maior_market_cap(tickers_candidatos, num_top):
+# A instrumentação é compartilhada com a limpeza de dados e fica na raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrumentacao import METRICAS, etapa, cronometrar  # noqa: E402
+
+# Host único atendido pelo yfinance; usado como chave do limitador de taxa
+HOST_YAHOO = 'query1.finance.yahoo.com'
+
+
+class LimitadorTaxa:
+    """
+    Limita o número de requisições por segundo para cada host, de forma segura entre threads.
+
+    Cada host recebe um intervalo mínimo entre requisições consecutivas; as threads
+    que chegam antes do horário liberado aguardam a sua vez.
+    """
+
+    def __init__(self, requisicoes_por_segundo):
+        self.intervalo = 1.0 / requisicoes_por_segundo if requisicoes_por_segundo else 0.0
+        self._proxima_liberacao = {}
+        self._trava = threading.Lock()
+
+    def aguardar(self, host=HOST_YAHOO):
+        """Bloqueia até que uma nova requisição ao host possa ser feita."""
+        if not self.intervalo:
+            return
+        with self._trava:
+            agora = time.monotonic()
+            liberacao = max(agora, self._proxima_liberacao.get(host, agora))
+            self._proxima_liberacao[host] = liberacao + self.intervalo
+        espera = liberacao - agora
+        if espera > 0:
+            time.sleep(espera)
+
+
+def executar_com_retentativas(funcao, tentativas=3, espera_inicial=1.0, limitador=None, host=HOST_YAHOO):
+    """
+    Executa uma chamada de rede repetindo-a com backoff exponencial em caso de erro.
+
+    Args:
+        funcao (callable): Função sem argumentos que realiza a chamada.
+        tentativas (int): Número máximo de tentativas.
+        espera_inicial (float): Espera, em segundos, antes da segunda tentativa; dobra a cada falha.
+        limitador (LimitadorTaxa, optional): Limitador consultado antes de cada tentativa.
+        host (str): Host usado como chave no limitador.
+
+    Returns:
+        O retorno de `funcao`. A exceção da última tentativa é propagada.
+    """
+    for tentativa in range(1, tentativas + 1):
+        if limitador is not None:
+            limitador.aguardar(host)
+        try:
+            return funcao()
+        except Exception:
+            if tentativa == tentativas:
+                raise
+            # Jitter evita que todas as threads tentem novamente no mesmo instante
+            time.sleep(espera_inicial * (2 ** (tentativa - 1)) * (1 + random.random() / 2))
+
+
+class CacheHistorico:
+    """
+    Cache local do histórico de preços em Parquet, com um arquivo por ticker.
+
+    A maior data gravada de cada ticker indica a partir de onde a próxima execução
+    precisa buscar dados; o restante do período vem do disco.
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self._ultimas_datas = {}
+        self._trava = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+
+    def _caminho(self, ticker_str):
+        return os.path.join(self.diretorio, f"ticker={ticker_str}", "historico.parquet")
+
+    def ler(self, ticker_str):
+        """Retorna o histórico gravado do ticker ou None se ainda não houver cache."""
+        caminho = self._caminho(ticker_str)
+        if not os.path.exists(caminho):
+            return None
+        return _com_datas_sem_fuso(pd.read_parquet(caminho))
+
+    def ultima_data(self, ticker_str):
+        """Retorna a última data (sem fuso) gravada para o ticker ou None."""
+        with self._trava:
+            if ticker_str in self._ultimas_datas:
+                return self._ultimas_datas[ticker_str]
+        caminho = self._caminho(ticker_str)
+        ultima = None
+        if os.path.exists(caminho):
+            # Lê apenas o índice de datas, sem carregar as colunas de preço
+            indice = pd.read_parquet(caminho, columns=[]).index
+            if len(indice):
+                ultima = _datas_sem_fuso(indice).max().date()
+        with self._trava:
+            self._ultimas_datas[ticker_str] = ultima
+        return ultima
+
+    def inicio_delta(self, ticker_str, data_inicial, data_final):
+        """
+        Calcula a data de início do próximo download do ticker.
+
+        A última data gravada é buscada de novo, pois o pregão do dia pode ter sido
+        salvo ainda incompleto.
+
+        Returns:
+            datetime or None: Início do download, ou None se o cache já cobre `data_final`.
+        """
+        ultima = self.ultima_data(ticker_str)
+        if ultima is None or ultima < data_inicial.date():
+            return data_inicial
+        if ultima >= data_final.date():
+            return None
+        return datetime.combine(ultima, datetime.min.time())
+
+    def atualizar(self, ticker_str, novos_dados):
+        """
+        Mescla novas barras ao histórico gravado e regrava o arquivo do ticker.
+
+        Returns:
+            pd.DataFrame: Histórico completo após a mesclagem.
+        """
+        existente = self.ler(ticker_str)
+        if novos_dados is None or novos_dados.empty:
+            return existente if existente is not None else pd.DataFrame()
+        # `Ticker.history()` devolve datas com fuso e `yf.download`, sem; o cache guarda sempre sem fuso
+        novos_dados = _com_datas_sem_fuso(novos_dados)
+
+        if existente is not None and not existente.empty:
+            combinado = pd.concat([existente, novos_dados])
+            # Em datas repetidas vale a barra mais recente
+            combinado = combinado[~combinado.index.duplicated(keep='last')].sort_index()
+        else:
+            combinado = novos_dados.sort_index()
+
+        caminho = self._caminho(ticker_str)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        # Grava em arquivo temporário e troca de uma vez, para que uma falha não corrompa o cache
+        caminho_tmp = caminho + ".tmp"
+        combinado.to_parquet(caminho_tmp)
+        os.replace(caminho_tmp, caminho)
+
+        with self._trava:
+            self._ultimas_datas[ticker_str] = _datas_sem_fuso(combinado.index).max().date()
+        return combinado
+
+
+class CacheMetadados:
+    """
+    Cache em disco (JSON) do `.info` de cada ticker, com prazo de validade.
+
+    Metadados mudam pouco, então uma entrada mais nova que `ttl_horas` é usada sem
+    consultar a rede.
+    """
+
+    def __init__(self, caminho_arquivo, ttl_horas=24):
+        self.caminho_arquivo = caminho_arquivo
+        self.ttl = timedelta(hours=ttl_horas)
+        self._entradas = {}
+        self._trava = threading.Lock()
+        if os.path.exists(caminho_arquivo):
+            try:
+                with open(caminho_arquivo, encoding='utf-8') as arquivo:
+                    self._entradas = json.load(arquivo)
+            except (OSError, ValueError) as e:
+                print(f"  - Cache de metadados ignorado ({e}).")
+
+    def obter(self, ticker_str):
+        """Retorna o info do ticker se houver entrada não vazia dentro da validade; senão None."""
+        with self._trava:
+            entrada = self._entradas.get(ticker_str)
+        if not entrada or not entrada.get('info'):
+            return None
+        buscado_em = datetime.fromisoformat(entrada['buscado_em'])
+        if datetime.now() - buscado_em > self.ttl:
+            return None
+        return entrada['info']
+
+    def guardar(self, ticker_str, info):
+        """Registra o info recém-buscado de um ticker."""
+        with self._trava:
+            self._entradas[ticker_str] = {'buscado_em': datetime.now().isoformat(), 'info': info}
+
+    def salvar(self):
+        """Grava todas as entradas no arquivo JSON."""
+        with self._trava:
+            conteudo = json.dumps(self._entradas, default=str)
+        diretorio = os.path.dirname(self.caminho_arquivo)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        caminho_tmp = self.caminho_arquivo + ".tmp"
+        with open(caminho_tmp, 'w', encoding='utf-8') as arquivo:
+            arquivo.write(conteudo)
+        os.replace(caminho_tmp, self.caminho_arquivo)
+
+
+def _datas_sem_fuso(indice):
+    """Converte um índice de datas para datetime sem fuso horário, para comparações."""
+    indice = pd.DatetimeIndex(indice)
+    return indice.tz_localize(None) if indice.tz is not None else indice
+
+
+def _com_datas_sem_fuso(df):
+    """Retorna o DataFrame com o índice convertido para datas sem fuso, como é gravado no cache."""
+    df = df.copy()
+    df.index = _datas_sem_fuso(df.index).normalize()
+    return df
+
+
+class RepositorioMetadados:
+    """
+    Armazena em memória o `.info` de cada ticker para que seja buscado uma única vez por execução.
+
+    A mesma instância é compartilhada entre a seleção por valor de mercado e o
+    enriquecimento, evitando repetir a chamada mais lenta do pipeline.
+    """
+
+    def __init__(self, fabrica_ticker=None, tentativas=3, limitador=None, cache=None):
+        self.fabrica_ticker = fabrica_ticker or yf.Ticker
+        self.tentativas = tentativas
+        self.limitador = limitador
+        self.cache = cache
+        self._infos = {}
+        self._trava = threading.Lock()
+
+    def obter(self, ticker_str):
+        """Retorna o dicionário `.info` do ticker, buscando-o na rede apenas na primeira vez."""
+        with self._trava:
+            if ticker_str in self._infos:
+                return self._infos[ticker_str]
+
+        info = self.cache.obter(ticker_str) if self.cache is not None else None
+        if info is None:
+            ticker_obj = self.fabrica_ticker(ticker_str)
+            with cronometrar('info', ticker=ticker_str):
+                info = executar_com_retentativas(
+                    lambda: ticker_obj.info, tentativas=self.tentativas, limitador=self.limitador
+                ) or {}
+            # Um info vazio (falha momentânea da API) não é guardado, para ser buscado de novo na próxima execução
+            if self.cache is not None and info:
+                self.cache.guardar(ticker_str, info)
+
+        with self._trava:
+            self._infos[ticker_str] = info
+        return info
+
+    @etapa(linhas_saida=len)
+    def carregar(self, lista_tickers, max_workers=1):
+        """
+        Busca os metadados de vários tickers, em paralelo quando `max_workers` > 1.
+
+        Returns:
+            dict: Mapeamento ticker -> info; tickers com erro ficam de fora.
+        """
+        def obter_seguro(ticker_str):
+            try:
+                return self.obter(ticker_str)
+            except Exception as e:
+                print(f"  - Erro ao buscar informações de {ticker_str}: {e}")
+                return None
+
+        if max_workers > 1:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                infos = list(executor.map(obter_seguro, lista_tickers))
+        else:
+            infos = [obter_seguro(ticker_str) for ticker_str in lista_tickers]
+
+        return {t: info for t, info in zip(lista_tickers, infos) if info is not None}
+
+
+@etapa
+def obter_tickers_maior_market_cap(tickers_candidatos, num_top, metadados=None, max_workers=1):
     """
     Identifica os tickers das N empresas com maior valor de mercado.
 
     Args:
         tickers_candidatos (list): Lista de strings com os tickers a serem avaliados.
         num_top (int): O número de tickers a serem retornados.
+        metadados (RepositorioMetadados, optional): Repositório compartilhado com a etapa de extração.
+        max_workers (int): Número máximo de consultas de metadados em paralelo.
 
     Returns:
         list: Lista contendo as strings dos N tickers com maior valor de mercado.
     """
     print(f"Buscando valor de mercado para definir os Top {num_top} tickers...")
+    metadados = metadados or RepositorioMetadados()
+    infos = metadados.carregar(tickers_candidatos, max_workers=max_workers)
     valores_mercado = []
-    
-    for ticker_str in tickers_candidatos:
-        try:
-            ticker_obj = yf.Ticker(ticker_str)
-            valor_mercado = ticker_obj.info.get('marketCap')
-            if valor_mercado:
-                valores_mercado.append((ticker_str, valor_mercado))
-            else:
-                print(f"  - Não foi possível obter o valor de mercado para {ticker_str}")
-        except Exception as e:
-            print(f"  - Erro ao buscar informações de {ticker_str}: {e}")
+
+    for ticker_str, info in infos.items():
+        valor_mercado = info.get('marketCap')
+        if valor_mercado:
+            valores_mercado.append((ticker_str, valor_mercado))
+        else:
+            print(f"  - Não foi possível obter o valor de mercado para {ticker_str}")
             
     valores_mercado.sort(key=lambda x: x[1], reverse=True)
     top_tickers_lista = [ticker for ticker, cap in valores_mercado[:num_top]]
@@ -39,12 +320,128 @@ def obter_tickers_maior_market_cap(tickers_candidatos, num_top):
     return top_tickers_lista
 
 
-def extrair_e_enriquecer_dados(lista_tickers):
+@etapa(linhas_saida=len)
+def baixar_historico_em_lote(lista_tickers, data_inicial, data_final, funcao_download=None):
+    """
+    Baixa o histórico de vários tickers em uma única chamada ao `yf.download`.
+
+    Args:
+        lista_tickers (list): Tickers a serem baixados.
+        data_inicial (datetime): Início do período.
+        data_final (datetime): Fim do período.
+        funcao_download (callable, optional): Substituto de `yf.download` com a mesma assinatura.
+
+    Returns:
+        dict: Mapeamento ticker -> DataFrame de histórico; tickers sem dados ficam de fora.
+    """
+    funcao_download = funcao_download or yf.download
+    dados = funcao_download(
+        lista_tickers, start=data_inicial, end=data_final, auto_adjust=True,
+        group_by='ticker', threads=True, progress=False
+    )
+    if dados is None or dados.empty:
+        return {}
+
+    historicos = {}
+    for ticker_str in lista_tickers:
+        if isinstance(dados.columns, pd.MultiIndex):
+            if ticker_str not in dados.columns.get_level_values(0):
+                continue
+            dados_ticker = dados[ticker_str]
+        else:
+            # Com um único ticker algumas versões devolvem colunas simples
+            dados_ticker = dados
+        # Datas em que só outros tickers negociaram aparecem como linhas vazias
+        dados_ticker = dados_ticker.dropna(how='all')
+        if not dados_ticker.empty:
+            dados_ticker = dados_ticker.copy()
+            dados_ticker.columns.name = None
+            historicos[ticker_str] = dados_ticker
+    return historicos
+
+
+def _enriquecer(dados_historicos, ticker_str, info):
+    """Adiciona ao histórico de um ticker as colunas de metadados da empresa."""
+    dados_historicos['ticker'] = ticker_str
+    dados_historicos['nome_empresa'] = info.get('longName', '')
+    dados_historicos['setor'] = info.get('sector', '')
+    dados_historicos['industria'] = info.get('industry', '')
+    return dados_historicos
+
+
+def _consolidar_historico(ticker_str, novos_dados, cache, data_inicial):
+    """
+    Junta as barras recém-baixadas ao cache e devolve apenas o período solicitado.
+
+    Sem cache, os dados baixados já correspondem ao período e são devolvidos como estão.
+    """
+    if cache is None:
+        return novos_dados
+    historico = cache.atualizar(ticker_str, novos_dados)
+    if historico.empty:
+        return historico
+    return historico[_datas_sem_fuso(historico.index) >= pd.Timestamp(data_inicial.date())].copy()
+
+
+def _extrair_ticker(ticker_str, data_inicial, data_final, metadados, tentativas, limitador, cache=None):
+    """
+    Baixa o histórico de um único ticker e o enriquece com seus metadados.
+
+    Com cache, apenas as datas posteriores à última gravada são pedidas à rede.
+
+    Returns:
+        pd.DataFrame or None: Dados do ticker ou None se não houver histórico ou ocorrer erro.
+    """
+    try:
+        print(f"+ Processando {ticker_str}...")
+        inicio = cache.inicio_delta(ticker_str, data_inicial, data_final) if cache else data_inicial
+
+        novos_dados = None
+        if inicio is not None:
+            ticker_obj = metadados.fabrica_ticker(ticker_str)
+            # Baixa os dados históricos para este ticker
+            with cronometrar('history', ticker=ticker_str):
+                novos_dados = executar_com_retentativas(
+                    lambda: ticker_obj.history(start=inicio, end=data_final, auto_adjust=True),
+                    tentativas=tentativas, limitador=limitador
+                )
+
+        dados_historicos = _consolidar_historico(ticker_str, novos_dados, cache, data_inicial)
+
+        if dados_historicos is None or dados_historicos.empty:
+            print(f"  - Nenhum dado histórico encontrado para {ticker_str}.")
+            return None
+
+        # Enriquece os dados com o info já buscado na seleção, se disponível
+        return _enriquecer(dados_historicos, ticker_str, metadados.obter(ticker_str))
+
+    except Exception as e:
+        print(f"  - ERRO ao processar o ticker {ticker_str}: {e}")
+        return None
+
+
+@etapa
+def extrair_e_enriquecer_dados(lista_tickers, max_workers=1, requisicoes_por_segundo=None,
+                               tentativas=3, fabrica_ticker=None, metadados=None,
+                               download_em_lote=False, funcao_download=None, cache=None):
     """
-    Extrai dados históricos e os enriquece com metadados, processando um ticker por vez.
+    Extrai dados históricos e os enriquece com metadados.
+
+    Com `max_workers` igual a 1 os tickers são processados um por vez; valores maiores
+    usam um pool de threads, já que quase todo o tempo é gasto esperando a rede.
+    Com `download_em_lote` o histórico de todos os tickers vem de uma única chamada.
+    O resultado mantém sempre a ordem de `lista_tickers`.
 
     Args:
         lista_tickers (list): A lista dos tickers selecionados para extração.
+        max_workers (int): Número máximo de tickers processados em paralelo.
+        requisicoes_por_segundo (float, optional): Limite de requisições por segundo ao Yahoo Finance.
+        tentativas (int): Número de tentativas por chamada de rede antes de desistir do ticker.
+        fabrica_ticker (callable, optional): Construtor de objetos Ticker; padrão `yf.Ticker`.
+        metadados (RepositorioMetadados, optional): Repositório de `.info` já preenchido na seleção.
+        download_em_lote (bool): Se True, usa `yf.download` para todos os tickers de uma vez.
+        funcao_download (callable, optional): Substituto de `yf.download` para o modo em lote.
+        cache (CacheHistorico, optional): Cache local; quando informado só o trecho faltante é baixado.
 
     Returns:
         pd.DataFrame or None: DataFrame com dados combinados ou None se a extração falhar.
@@ -52,48 +449,89 @@ def extrair_e_enriquecer_dados(lista_tickers):
     print("\nIniciando ETAPA DE EXTRAÇÃO E ENRIQUECIMENTO...")
     data_final = datetime.now()
     data_inicial = data_final - relativedelta(years=1)
-    
-    todos_dados = []
-    
-    for ticker_str in lista_tickers:
-        try:
-            print(f"+ Processando {ticker_str}...")
-            ticker_obj = yf.Ticker(ticker_str)
-            
-            # Baixa os dados históricos para este ticker
-            dados_historicos = ticker_obj.history(start=data_inicial, end=data_final, auto_adjust=True)
-            
-            if dados_historicos.empty:
+    if requisicoes_por_segundo:
+        limitador = LimitadorTaxa(requisicoes_por_segundo)
+    else:
+        # Reaproveita o limitador do repositório para que as duas etapas dividam a mesma cota
+        limitador = metadados.limitador if metadados is not None else None
+    if metadados is None:
+        metadados = RepositorioMetadados(fabrica_ticker, tentativas=tentativas, limitador=limitador)
+
+    if download_em_lote:
+        # Tickers com a mesma data de início compartilham uma única chamada de download
+        grupos_por_inicio = {}
+        for ticker_str in lista_tickers:
+            inicio = cache.inicio_delta(ticker_str, data_inicial, data_final) if cache else data_inicial
+            grupos_por_inicio.setdefault(inicio, []).append(ticker_str)
+
+        novos_por_ticker = {}
+        for inicio, grupo in grupos_por_inicio.items():
+            if inicio is None:
+                continue
+            try:
+                novos_por_ticker.update(executar_com_retentativas(
+                    lambda: baixar_historico_em_lote(grupo, inicio, data_final, funcao_download),
+                    tentativas=tentativas, limitador=limitador
+                ))
+            except Exception as e:
+                print(f"  - ERRO no download em lote: {e}")
+
+        historicos = {}
+        for ticker_str in lista_tickers:
+            try:
+                dados = _consolidar_historico(ticker_str, novos_por_ticker.get(ticker_str), cache, data_inicial)
+            except Exception as e:
+                print(f"  - ERRO ao processar o ticker {ticker_str}: {e}")
+                continue
+            if dados is not None and not dados.empty:
+                historicos[ticker_str] = dados
+
+        infos = metadados.carregar([t for t in lista_tickers if t in historicos], max_workers=max_workers)
+        resultados = []
+        for ticker_str in lista_tickers:
+            if ticker_str not in historicos:
                 print(f"  - Nenhum dado histórico encontrado para {ticker_str}.")
-                continue # Pula para o próximo ticker
-
-            # Enriquece os dados
-            info = ticker_obj.info
-            dados_historicos['ticker'] = ticker_str
-            dados_historicos['nome_empresa'] = info.get('longName', '')
-            dados_historicos['setor'] = info.get('sector', '')
-            dados_historicos['industria'] = info.get('industry', '')
-            
-            todos_dados.append(dados_historicos)
+                continue
+            resultados.append(_enriquecer(historicos[ticker_str], ticker_str, infos.get(ticker_str, {})))
+    else:
+        def extrair(ticker_str):
+            return _extrair_ticker(ticker_str, data_inicial, data_final, metadados, tentativas, limitador, cache)
 
-        except Exception as e:
-            print(f"  - ERRO ao processar o ticker {ticker_str}: {e}")
+        if max_workers > 1:
+            # executor.map devolve os resultados na ordem de entrada, independente de qual termina antes
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                resultados = list(executor.map(extrair, lista_tickers))
+        else:
+            resultados = [extrair(ticker_str) for ticker_str in lista_tickers]
+
+    todos_dados = [dados for dados in resultados if dados is not None]
 
     if not todos_dados:
         print("\nNenhum dado foi extraído com sucesso.")
         return None
 
-    # Concatena todos os dataframes em um só ao final do loop
+    # Concatena todos os dataframes em um só ao final da extração
     df_final = pd.concat(todos_dados).reset_index()
     print("\n+ Extração e enriquecimento concluídos.")
     return df_final
 
 
-def transformar_dataframe_final(df):
+def _memoria_mb(df):
+    """Retorna a memória ocupada pelo DataFrame, em MB, incluindo o conteúdo das strings."""
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
+
+
+@etapa
+def transformar_dataframe_final(df, compacto=False):
     """
     Transforma e padroniza o DataFrame de dados brutos.
+
+    No modo `compacto` as datas ficam como datetime64, as colunas de texto repetidas
+    viram categóricas e os preços, float32; a formatação como texto fica a cargo do
+    destino que precisar dela. Sem ele, as datas saem como strings 'AAAA-MM-DD'.
     """
     print("\nIniciando ETAPA DE TRANSFORMAÇÃO...")
+    memoria_inicial = _memoria_mb(df)
     
     df.columns = [col.lower() for col in df.columns]
 
@@ -108,46 +546,367 @@ def transformar_dataframe_final(df):
         'data', 'codigo_acao', 'nome_empresa', 'setor', 'industria',
         'preco_abertura', 'preco_maximo', 'preco_minimo', 'preco_fechamento', 'volume_negociado'
     ]
-    
-    colunas_existentes = [col for col in colunas_finais if col in df.columns]
-    df = df[colunas_existentes].copy()
-
     colunas_preco = ['preco_abertura', 'preco_maximo', 'preco_minimo', 'preco_fechamento']
-    for col in colunas_preco:
-        if col in df.columns:
-            df[col] = df[col].round(2)
-    
-    if 'data' in df.columns:
-        df['data'] = pd.to_datetime(df['data']).dt.strftime('%Y-%m-%d')
+    colunas_categoricas = ['codigo_acao', 'nome_empresa', 'setor', 'industria']
+
+    # Monta o resultado coluna a coluna, sem copiar antes o DataFrame inteiro
+    colunas = {}
+    for col in colunas_finais:
+        if col not in df.columns:
+            continue
+        serie = df[col]
+        if col in colunas_preco:
+            serie = serie.round(2)
+            if compacto:
+                serie = serie.astype('float32')
+        elif col == 'data':
+            serie = pd.to_datetime(serie)
+            if compacto:
+                if serie.dt.tz is not None:
+                    serie = serie.dt.tz_localize(None)
+                serie = serie.dt.normalize()
+            else:
+                serie = serie.dt.strftime('%Y-%m-%d')
+        elif compacto and col in colunas_categoricas:
+            serie = serie.astype('category')
+        colunas[col] = serie
+    df = pd.DataFrame(colunas)
+
+    print(f"Dados transformados com sucesso! Memória: {memoria_inicial:.2f} MB -> {_memoria_mb(df):.2f} MB")
+    return df
+
+
+@etapa
+def separar_dimensao_empresas(df):
+    """
+    Separa os metadados das empresas em uma tabela de dimensão, uma linha por ticker.
+
+    Returns:
+        tuple: (fatos, dimensao) — o histórico sem as colunas de metadados e a tabela
+        codigo_acao -> nome_empresa, setor, industria.
+    """
+    colunas_dimensao = [col for col in ['nome_empresa', 'setor', 'industria'] if col in df.columns]
+    dimensao = (
+        df[['codigo_acao'] + colunas_dimensao]
+        .drop_duplicates(subset=['codigo_acao'], keep='last')
+        .reset_index(drop=True)
+    )
+    return df.drop(columns=colunas_dimensao), dimensao
+
+
+def _posicao_no_grupo(codigos):
+    """Para um vetor de códigos de grupo já ordenado, retorna a posição de cada linha dentro do seu grupo."""
+    indices = np.arange(len(codigos))
+    inicio_grupo = np.r_[True, codigos[1:] != codigos[:-1]] if len(codigos) else np.array([], dtype=bool)
+    return indices - np.maximum.accumulate(np.where(inicio_grupo, indices, 0))
+
+
+def _media_movel_por_grupo(valores, posicao, janela, desvio=False):
+    """
+    Média (ou desvio padrão amostral) móvel calculada com somas acumuladas, sem laço por grupo.
+
+    Uma janela só é válida quando está inteira dentro do grupo e não contém NaN;
+    nas demais posições o resultado é NaN.
+    """
+    validos = ~np.isnan(valores)
+    x = np.where(validos, valores, 0.0)
+    soma_acum = np.concatenate(([0.0], np.cumsum(x)))
+    contagem_acum = np.concatenate(([0], np.cumsum(validos)))
+
+    fim = np.arange(1, len(x) + 1)
+    inicio = np.maximum(fim - janela, 0)
+    soma = soma_acum[fim] - soma_acum[inicio]
+    completa = (posicao >= janela - 1) & (contagem_acum[fim] - contagem_acum[inicio] == janela)
+    media = soma / janela
 
-    print("Dados transformados com sucesso!")
+    if desvio:
+        quad_acum = np.concatenate(([0.0], np.cumsum(x * x)))
+        soma_quad = quad_acum[fim] - quad_acum[inicio]
+        variancia = np.maximum(soma_quad - janela * media * media, 0.0) / (janela - 1)
+        return np.where(completa, np.sqrt(variancia), np.nan)
+    return np.where(completa, media, np.nan)
+
+
+@etapa
+def calcular_indicadores_tecnicos(df, janelas_media=(20, 50), janela_volatilidade=20, janela_rsi=14):
+    """
+    Calcula indicadores técnicos para todos os tickers de uma vez, com operações vetorizadas.
+
+    As linhas são ordenadas por (ticker, data) apenas internamente; os resultados voltam
+    para a ordem original do DataFrame. O RSI usa médias simples de ganhos e perdas
+    (variante de Cutler), que permitem o cálculo por somas acumuladas.
+
+    Args:
+        df (pd.DataFrame): Saída de `transformar_dataframe_final`.
+        janelas_media (tuple): Janelas, em pregões, das médias móveis do fechamento.
+        janela_volatilidade (int): Janela da volatilidade anualizada dos retornos diários.
+        janela_rsi (int): Janela do RSI.
+
+    Returns:
+        pd.DataFrame: O próprio DataFrame com as colunas de indicadores adicionadas.
+    """
+    print("\nCalculando indicadores técnicos...")
+    codigos = pd.factorize(df['codigo_acao'])[0]
+    datas = pd.to_datetime(df['data']).values
+    ordem = np.lexsort((datas, codigos))
+
+    fechamento = df['preco_fechamento'].to_numpy(dtype='float64')[ordem]
+    posicao = _posicao_no_grupo(codigos[ordem])
+
+    fechamento_anterior = np.r_[np.nan, fechamento[:-1]] if len(fechamento) else fechamento
+    fechamento_anterior = np.where(posicao == 0, np.nan, fechamento_anterior)
+    variacao = fechamento - fechamento_anterior
+    retorno = variacao / fechamento_anterior
+
+    indicadores = {'retorno_diario': np.round(retorno, 6)}
+    for janela in janelas_media:
+        indicadores[f'media_movel_{janela}'] = np.round(_media_movel_por_grupo(fechamento, posicao, janela), 2)
+
+    volatilidade = _media_movel_por_grupo(retorno, posicao, janela_volatilidade, desvio=True) * np.sqrt(252)
+    indicadores[f'volatilidade_{janela_volatilidade}'] = np.round(volatilidade, 6)
+
+    ganho_medio = _media_movel_por_grupo(np.where(np.isnan(variacao), np.nan, np.maximum(variacao, 0)), posicao, janela_rsi)
+    perda_media = _media_movel_por_grupo(np.where(np.isnan(variacao), np.nan, np.maximum(-variacao, 0)), posicao, janela_rsi)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rsi = np.where(perda_media == 0, 100.0, 100 - 100 / (1 + ganho_medio / perda_media))
+    indicadores[f'rsi_{janela_rsi}'] = np.round(np.where(np.isnan(ganho_medio), np.nan, rsi), 2)
+
+    # Devolve cada indicador para a ordem original das linhas
+    for nome, valores_ordenados in indicadores.items():
+        valores = np.empty(len(ordem))
+        valores[ordem] = valores_ordenados
+        df[nome] = valores
+
+    print(f"-> {len(indicadores)} indicadores calculados.")
     return df
 
 
-def carregar_para_gsheets(df, nome_planilha, id_spreadsheet, arq_credenciais):
+@etapa
+def atualizar_indicadores_tecnicos(df_existente, df_novos, janelas_media=(20, 50), janela_volatilidade=20,
+                                   janela_rsi=14):
+    """
+    Anexa novas barras a um histórico que já possui indicadores, calculando apenas as linhas novas.
+
+    De cada ticker do histórico só são usadas as últimas linhas necessárias para
+    preencher as janelas; barras novas com a mesma (data, codigo_acao) substituem as antigas.
+
+    Returns:
+        pd.DataFrame: Histórico existente acrescido das novas linhas com indicadores.
+    """
+    colunas_base = [col for col in df_novos.columns if col in df_existente.columns]
+    novos = df_novos[colunas_base].copy()
+    chaves_novas = pd.MultiIndex.from_frame(novos[['data', 'codigo_acao']].astype(str))
+    chaves_existentes = pd.MultiIndex.from_frame(df_existente[['data', 'codigo_acao']].astype(str))
+    existente = df_existente[~chaves_existentes.isin(chaves_novas)]
+
+    # Contexto: a maior janela mais uma linha (para o retorno) do fim de cada ticker
+    tamanho_contexto = max(max(janelas_media), janela_volatilidade + 1, janela_rsi + 1)
+    contexto = (
+        existente.assign(_data_ordem=pd.to_datetime(existente['data']))
+        .sort_values(['codigo_acao', '_data_ordem'])
+        .groupby('codigo_acao', sort=False, observed=True).tail(tamanho_contexto)
+        .drop(columns=['_data_ordem'])[colunas_base]
+    )
+
+    combinado = pd.concat([contexto.assign(_novo=False), novos.assign(_novo=True)], ignore_index=True)
+    combinado = calcular_indicadores_tecnicos(combinado, janelas_media, janela_volatilidade, janela_rsi)
+    novos_com_indicadores = combinado[combinado['_novo']].drop(columns=['_novo'])
+
+    return pd.concat([existente, novos_com_indicadores], ignore_index=True)
+
+
+def _chaves_linhas(df):
+    """Identifica cada linha por (data, codigo_acao) em texto, comparável entre DataFrames de tipos diferentes."""
+    return pd.MultiIndex.from_frame(df[['data', 'codigo_acao']].astype(str))
+
+
+def _linhas_a_calcular(df, df_existente):
+    """
+    Marca as linhas de `df` a partir da última data gravada do seu ticker em `df_existente`.
+
+    A última barra gravada também é recalculada, pois pode ter sido salva com o pregão
+    incompleto. Retorna None se faltar no histórico alguma linha anterior a esse ponto,
+    caso em que o contexto das janelas não seria confiável.
+    """
+    ultima_data = pd.to_datetime(df_existente['data']).groupby(df_existente['codigo_acao'].astype(str)).max()
+    limite = df['codigo_acao'].astype(str).map(ultima_data)
+    novas = (limite.isna() | (pd.to_datetime(df['data']) >= limite)).to_numpy()
+    ausentes = ~_chaves_linhas(df).isin(_chaves_linhas(df_existente))
+    if (ausentes & ~novas).any():
+        return None
+    return novas
+
+
+@etapa
+def calcular_indicadores_incremental(df, caminho_arquivo):
+    """
+    Calcula os indicadores reaproveitando os gravados pela execução anterior.
+
+    Só as barras novas de cada ticker passam por `atualizar_indicadores_tecnicos`; as
+    demais mantêm os valores de `caminho_arquivo`. Sem esse arquivo, ou se ele não puder
+    ser usado, o período inteiro é calculado com `calcular_indicadores_tecnicos`. Ao final
+    o resultado substitui o arquivo, para a próxima execução.
+
+    Args:
+        df (pd.DataFrame): Saída de `transformar_dataframe_final`.
+        caminho_arquivo (str): Parquet com o resultado da execução anterior.
+
+    Returns:
+        pd.DataFrame: O próprio DataFrame com as colunas de indicadores adicionadas.
+    """
+    colunas_base = list(df.columns)
+    existente, novas = None, None
+    if os.path.exists(caminho_arquivo):
+        try:
+            existente = pd.read_parquet(caminho_arquivo)
+            if set(colunas_base).issubset(existente.columns) and len(existente.columns) > len(colunas_base):
+                novas = _linhas_a_calcular(df, existente)
+        except Exception as e:
+            print(f"  - Aviso: indicadores gravados ignorados ({e}).")
+
+    if novas is None:
+        df = calcular_indicadores_tecnicos(df)
+    else:
+        print(f"\nAtualizando indicadores técnicos de {int(novas.sum())} de {len(df)} linhas...")
+        combinado = atualizar_indicadores_tecnicos(existente, df[novas])
+        colunas_indicadores = [col for col in combinado.columns if col not in colunas_base]
+        valores = combinado[colunas_indicadores].set_axis(_chaves_linhas(combinado))
+        valores = valores[~valores.index.duplicated(keep='last')].reindex(_chaves_linhas(df))
+        for col in colunas_indicadores:
+            df[col] = valores[col].to_numpy()
+
+    os.makedirs(os.path.dirname(caminho_arquivo) or '.', exist_ok=True)
+    df.to_parquet(caminho_arquivo + '.tmp', index=False)
+    os.replace(caminho_arquivo + '.tmp', caminho_arquivo)
+    return df
+
+
+def _autenticar_gsheets(arq_credenciais):
+    """Cria um cliente gspread autenticado com a conta de serviço informada."""
+    creds = Credentials.from_service_account_file(arq_credenciais, scopes=[
+        "https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"
+    ])
+    return gspread.authorize(creds)
+
+
+def _valores_texto(df_bloco):
+    """Converte um bloco do DataFrame para a lista de listas de strings aceita pela API."""
+    colunas = {}
+    for col in df_bloco.columns:
+        serie = df_bloco[col]
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            serie = serie.dt.strftime('%Y-%m-%d')
+        elif isinstance(serie.dtype, pd.CategoricalDtype):
+            serie = serie.astype(object)
+        colunas[col] = serie.fillna('').astype(str)
+    return pd.DataFrame(colunas).values.tolist()
+
+
+def _escrever_em_lotes(aba, df, linha_inicial, linhas_por_lote):
+    """Escreve o DataFrame a partir de `linha_inicial`, em requisições de até `linhas_por_lote` linhas."""
+    for inicio in range(0, len(df), linhas_por_lote):
+        bloco = df.iloc[inicio:inicio + linhas_por_lote]
+        with cronometrar('gsheets_update', linhas=len(bloco)):
+            aba.update(range_name=f"A{linha_inicial + inicio}", values=_valores_texto(bloco))
+
+
+def _carregar_substituindo(aba, df, linhas_por_lote):
+    """Apaga a aba e grava o DataFrame inteiro, com cabeçalho."""
+    aba.clear()
+    aba.resize(rows=len(df) + 1, cols=len(df.columns))
+    aba.update(range_name='A1', values=[df.columns.values.tolist()])
+    _escrever_em_lotes(aba, df, 2, linhas_por_lote)
+    print(f"-> {len(df)} linhas gravadas (substituição completa).")
+
+
+def _carregar_incremental(aba, df, colunas_chave, linhas_por_lote):
+    """
+    Grava apenas as linhas novas ou alteradas, comparando com o conteúdo atual da aba.
+
+    As linhas existentes são lidas uma única vez e indexadas pelas colunas-chave;
+    linhas alteradas são reescritas no lugar e as novas são anexadas ao final.
+    """
+    with cronometrar('gsheets_leitura'):
+        valores_atuais = aba.get_all_values()
+    cabecalho = df.columns.values.tolist()
+
+    if not valores_atuais or valores_atuais[0] != cabecalho:
+        print("  - Cabeçalho da aba difere do DataFrame; recarregando a aba inteira.")
+        _carregar_substituindo(aba, df, linhas_por_lote)
+        return
+
+    # Normaliza a largura das linhas lidas para comparar célula a célula com o DataFrame
+    num_colunas = len(cabecalho)
+    valores_atuais = [(linha + [''] * num_colunas)[:num_colunas] for linha in valores_atuais]
+
+    posicoes_chave = [cabecalho.index(col) for col in colunas_chave]
+    # Mapeia cada chave para o número da linha na planilha (1-based, cabeçalho na linha 1)
+    linha_por_chave = {
+        tuple(linha[i] if i < len(linha) else '' for i in posicoes_chave): numero
+        for numero, linha in enumerate(valores_atuais[1:], start=2)
+    }
+
+    atualizacoes = []
+    indices_novos = []
+    for inicio in range(0, len(df), linhas_por_lote):
+        bloco = _valores_texto(df.iloc[inicio:inicio + linhas_por_lote])
+        for deslocamento, linha in enumerate(bloco):
+            chave = tuple(linha[i] for i in posicoes_chave)
+            numero = linha_por_chave.get(chave)
+            if numero is None:
+                indices_novos.append(inicio + deslocamento)
+            elif valores_atuais[numero - 1] != linha:
+                atualizacoes.append({'range': f"A{numero}", 'values': [linha]})
+
+    for inicio in range(0, len(atualizacoes), linhas_por_lote):
+        with cronometrar('gsheets_batch_update', linhas=len(atualizacoes[inicio:inicio + linhas_por_lote])):
+            aba.batch_update(atualizacoes[inicio:inicio + linhas_por_lote])
+
+    if indices_novos:
+        proxima_linha = len(valores_atuais) + 1
+        total_linhas = len(valores_atuais) + len(indices_novos)
+        if total_linhas > aba.row_count or len(cabecalho) > aba.col_count:
+            aba.resize(rows=max(total_linhas, aba.row_count), cols=max(len(cabecalho), aba.col_count))
+        _escrever_em_lotes(aba, df.iloc[indices_novos], proxima_linha, linhas_por_lote)
+
+    print(f"-> {len(indices_novos)} linhas novas e {len(atualizacoes)} linhas atualizadas.")
+
+
+@etapa
+def carregar_para_gsheets(df, nome_planilha, id_spreadsheet, arq_credenciais, modo='substituir',
+                          colunas_chave=('data', 'codigo_acao'), max_celulas_por_requisicao=50000,
+                          cliente=None):
     """
     Carrega o DataFrame final em uma planilha do Google Sheets.
+
+    Args:
+        df (pd.DataFrame): Dados a serem carregados.
+        nome_planilha (str): Nome da aba de destino.
+        id_spreadsheet (str): ID da planilha.
+        arq_credenciais (str): Caminho do JSON da conta de serviço.
+        modo (str): 'substituir' regrava a aba inteira; 'incremental' envia só linhas novas ou alteradas.
+        colunas_chave (tuple): Colunas que identificam uma linha no modo incremental.
+        max_celulas_por_requisicao (int): Limite de células por requisição de escrita.
+        cliente (gspread.Client, optional): Cliente já autenticado; se omitido, usa `arq_credenciais`.
+
+    Returns:
+        bool: True se o carregamento foi concluído.
     """
     print("\nIniciando ETAPA DE CARREGAMENTO...")
     try:
-        creds = Credentials.from_service_account_file(arq_credenciais, scopes=[
-            "https://spreadsheets.google.com/feeds", "https://www.googleapis.com/auth/drive"
-        ])
-        client = gspread.authorize(creds)
+        client = cliente or _autenticar_gsheets(arq_credenciais)
         planilha = client.open_by_key(id_spreadsheet)
 
         try:
             aba = planilha.worksheet(nome_planilha)
         except gspread.exceptions.WorksheetNotFound:
-            aba = planilha.add_worksheet(title=nome_planilha, rows="1000", cols="20")
-
-        aba.clear()
-        df_limpo = df.fillna('').astype(str)
-        
-        aba.update(
-            range_name='A1',
-            values=[df_limpo.columns.values.tolist()] + df_limpo.values.tolist()
-        )
+            aba = planilha.add_worksheet(title=nome_planilha, rows=len(df) + 1, cols=len(df.columns))
+
+        linhas_por_lote = max(1, max_celulas_por_requisicao // max(1, len(df.columns)))
+        if modo == 'incremental':
+            _carregar_incremental(aba, df, list(colunas_chave), linhas_por_lote)
+        else:
+            _carregar_substituindo(aba, df, linhas_por_lote)
 
         id_aba = aba.id
         print(f"Dados carregados! Acesse: https://docs.google.com/spreadsheets/d/{id_spreadsheet}/edit#gid={id_aba}")
@@ -158,6 +917,245 @@ def carregar_para_gsheets(df, nome_planilha, id_spreadsheet, arq_credenciais):
         return False
 
 
+@etapa
+def resumir_por_ticker(df):
+    """
+    Resume o histórico em uma linha por ticker, adequada a destinos pequenos como o Google Sheets.
+
+    Returns:
+        pd.DataFrame: Período, último fechamento, retorno no período e volume médio de cada ticker.
+    """
+    ordenado = df.sort_values(['codigo_acao', 'data'])
+    grupos = ordenado.groupby('codigo_acao', sort=False, observed=True)
+    resumo = grupos.agg(
+        nome_empresa=('nome_empresa', 'first'), setor=('setor', 'first'),
+        data_inicial=('data', 'first'), data_final=('data', 'last'),
+        primeiro_fechamento=('preco_fechamento', 'first'), ultimo_fechamento=('preco_fechamento', 'last'),
+        volume_medio=('volume_negociado', 'mean')
+    ).reset_index()
+    # Preços podem vir em float32 (modo compacto); o resumo é calculado em float64
+    for col in ['primeiro_fechamento', 'ultimo_fechamento']:
+        resumo[col] = resumo[col].astype('float64').round(2)
+    resumo['retorno_periodo_pct'] = (
+        (resumo['ultimo_fechamento'] / resumo['primeiro_fechamento'] - 1) * 100
+    ).round(2)
+    resumo['volume_medio'] = resumo['volume_medio'].round(0)
+    return resumo.drop(columns=['primeiro_fechamento'])
+
+
+class DestinoParquet:
+    """
+    Grava o histórico em Parquet particionado por ticker e ano (codigo_acao=X/ano=AAAA).
+
+    Segue o particionamento estilo Hive: ticker e ano ficam no caminho, não dentro do
+    arquivo. Cada partição é mesclada com a já existente pela data, então recargas
+    parciais não apagam anos fora da janela extraída; a coluna `data` é gravada sempre
+    como datetime, com ou sem o modo compacto. Os metadados das empresas vão para
+    `_empresas.parquet`, na raiz, em vez de se repetirem em cada linha; o prefixo '_'
+    faz o pyarrow ignorá-lo ao ler o diretório como dataset.
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+
+    @etapa
+    def carregar(self, df):
+        print(f"\nGravando Parquet particionado em: {self.diretorio}...")
+        os.makedirs(self.diretorio, exist_ok=True)
+        df, dimensao = separar_dimensao_empresas(df)
+        caminho_dimensao = os.path.join(self.diretorio, "_empresas.parquet")
+        # Versões anteriores gravavam a dimensão como 'empresas.parquet', que era lida como parte do dataset
+        caminho_legado = os.path.join(self.diretorio, "empresas.parquet")
+        existentes = [pd.read_parquet(caminho) for caminho in (caminho_legado, caminho_dimensao) if os.path.exists(caminho)]
+        if existentes:
+            dimensao = pd.concat(existentes + [dimensao.astype(object)], ignore_index=True)
+            dimensao = dimensao.drop_duplicates(subset=['codigo_acao'], keep='last')
+        dimensao.to_parquet(caminho_dimensao + ".tmp", index=False)
+        os.replace(caminho_dimensao + ".tmp", caminho_dimensao)
+        if os.path.exists(caminho_legado):
+            os.remove(caminho_legado)
+
+        df = df.assign(data=pd.to_datetime(df['data']))
+        anos = df['data'].dt.year
+        total_particoes = 0
+        # Cada partição é escrita separadamente, limitando a memória ao tamanho de uma partição
+        for (ticker_str, ano), bloco in df.groupby([df['codigo_acao'], anos], sort=False, observed=True):
+            caminho = os.path.join(self.diretorio, f"codigo_acao={ticker_str}", f"ano={ano}", "dados.parquet")
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            bloco = bloco.drop(columns=['codigo_acao'])
+            if os.path.exists(caminho):
+                # Partições antigas podem guardar a data como texto (carga sem o modo compacto)
+                existente = pd.read_parquet(caminho)
+                existente['data'] = pd.to_datetime(existente['data'])
+                bloco = pd.concat([existente, bloco], ignore_index=True)
+                bloco = bloco.drop_duplicates(subset=['data'], keep='last')
+            caminho_tmp = caminho + ".tmp"
+            bloco.sort_values('data').to_parquet(caminho_tmp, index=False)
+            os.replace(caminho_tmp, caminho)
+            total_particoes += 1
+        print(f"-> {len(df)} linhas gravadas em {total_particoes} partições.")
+        return True
+
+
+class DestinoCSV:
+    """Grava o histórico em um arquivo CSV, escrito em lotes de linhas."""
+
+    def __init__(self, caminho, linhas_por_lote=50000):
+        self.caminho = caminho
+        self.linhas_por_lote = linhas_por_lote
+
+    @etapa
+    def carregar(self, df):
+        print(f"\nGravando CSV em: {self.caminho}...")
+        diretorio = os.path.dirname(self.caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        caminho_tmp = self.caminho + ".tmp"
+        with open(caminho_tmp, 'w', encoding='utf-8', newline='') as arquivo:
+            for inicio in range(0, len(df), self.linhas_por_lote):
+                df.iloc[inicio:inicio + self.linhas_por_lote].to_csv(arquivo, index=False, header=(inicio == 0))
+        os.replace(caminho_tmp, self.caminho)
+        print(f"-> {len(df)} linhas gravadas.")
+        return True
+
+
+class DestinoSQLite:
+    """
+    Grava o histórico em uma tabela SQLite com inserção em lote.
+
+    A tabela é criada com chave primária nas colunas-chave, e linhas repetidas
+    substituem as anteriores (INSERT OR REPLACE). Colunas novas do DataFrame (como os
+    indicadores técnicos) são acrescentadas a uma tabela já existente.
+    """
+
+    TIPOS_SQL = {'f': 'REAL', 'i': 'INTEGER', 'u': 'INTEGER', 'b': 'INTEGER'}
+
+    def __init__(self, caminho, tabela='cotacoes', colunas_chave=('data', 'codigo_acao'), linhas_por_lote=50000):
+        self.caminho = caminho
+        self.tabela = tabela
+        self.colunas_chave = list(colunas_chave)
+        self.linhas_por_lote = linhas_por_lote
+
+    def _criar_tabela(self, conexao, df):
+        colunas_sql = ", ".join(
+            f'"{col}" {self.TIPOS_SQL.get(df[col].dtype.kind, "TEXT")}' for col in df.columns
+        )
+        chave = ", ".join(f'"{col}"' for col in self.colunas_chave)
+        conexao.execute(f'CREATE TABLE IF NOT EXISTS "{self.tabela}" ({colunas_sql}, PRIMARY KEY ({chave}))')
+
+        # Evolui o esquema de uma tabela criada por uma versão anterior do pipeline
+        existentes = {linha[1] for linha in conexao.execute(f'PRAGMA table_info("{self.tabela}")')}
+        for col in df.columns:
+            if col not in existentes:
+                tipo = self.TIPOS_SQL.get(df[col].dtype.kind, "TEXT")
+                conexao.execute(f'ALTER TABLE "{self.tabela}" ADD COLUMN "{col}" {tipo}')
+                print(f"-> Coluna '{col}' adicionada à tabela '{self.tabela}'.")
+
+    @etapa
+    def carregar(self, df):
+        print(f"\nGravando SQLite em: {self.caminho} (tabela '{self.tabela}')...")
+        diretorio = os.path.dirname(self.caminho)
+        if diretorio:
+            os.makedirs(diretorio, exist_ok=True)
+        colunas = ", ".join(f'"{col}"' for col in df.columns)
+        marcadores = ", ".join("?" for _ in df.columns)
+        comando = f'INSERT OR REPLACE INTO "{self.tabela}" ({colunas}) VALUES ({marcadores})'
+
+        with sqlite3.connect(self.caminho) as conexao:
+            self._criar_tabela(conexao, df)
+            for inicio in range(0, len(df), self.linhas_por_lote):
+                bloco = df.iloc[inicio:inicio + self.linhas_por_lote]
+                conexao.executemany(comando, _linhas_para_sqlite(bloco))
+        conexao.close()
+        print(f"-> {len(df)} linhas gravadas.")
+        return True
+
+
+def _linhas_para_sqlite(bloco):
+    """Converte um bloco do DataFrame em tuplas de tipos nativos aceitos pelo sqlite3."""
+    bloco = bloco.copy()
+    for col in bloco.columns:
+        if pd.api.types.is_datetime64_any_dtype(bloco[col]):
+            bloco[col] = bloco[col].dt.strftime('%Y-%m-%d')
+        elif bloco[col].dtype == 'float32':
+            # Passa pelo texto para gravar 123.45 e não a expansão binária 123.44999694824219
+            bloco[col] = pd.to_numeric(bloco[col].astype(str))
+    # dtype=object devolve int/float do Python, que o sqlite3 aceita (numpy.int64 não)
+    bloco = bloco.astype(object).where(bloco.notna(), None)
+    return bloco.itertuples(index=False, name=None)
+
+
+class DestinoGoogleSheets:
+    """
+    Destino Google Sheets; com `resumo=True` recebe apenas uma linha por ticker.
+
+    A planilha tem limites de tamanho e de cota, então o histórico completo deve ir
+    para um destino em arquivo e a planilha, para o resumo. Um `cliente` gspread já
+    autenticado (ou um substituto local) dispensa o arquivo de credenciais.
+    """
+
+    def __init__(self, nome_planilha, id_spreadsheet, arq_credenciais=None, modo='incremental', resumo=False, cliente=None):
+        self.nome_planilha = nome_planilha
+        self.id_spreadsheet = id_spreadsheet
+        self.arq_credenciais = arq_credenciais
+        self.modo = modo
+        self.resumo = resumo
+        self.cliente = cliente
+
+    @etapa
+    def carregar(self, df):
+        if self.resumo:
+            return carregar_para_gsheets(
+                resumir_por_ticker(df), self.nome_planilha, self.id_spreadsheet, self.arq_credenciais,
+                modo=self.modo, colunas_chave=('codigo_acao',), cliente=self.cliente
+            )
+        return carregar_para_gsheets(
+            df, self.nome_planilha, self.id_spreadsheet, self.arq_credenciais, modo=self.modo, cliente=self.cliente
+        )
+
+
+DESTINOS = {
+    'parquet': DestinoParquet,
+    'csv': DestinoCSV,
+    'sqlite': DestinoSQLite,
+    'gsheets': DestinoGoogleSheets,
+}
+
+
+def criar_destino(config):
+    """
+    Instancia um destino a partir de um dicionário de configuração.
+
+    Args:
+        config (dict): Deve conter 'tipo' (uma das chaves de DESTINOS); as demais
+            chaves são repassadas ao construtor do destino.
+    """
+    parametros = dict(config)
+    tipo = parametros.pop('tipo')
+    if tipo not in DESTINOS:
+        raise ValueError(f"Destino desconhecido: '{tipo}'. Opções: {', '.join(DESTINOS)}")
+    return DESTINOS[tipo](**parametros)
+
+
+@etapa
+def carregar_em_destinos(df, destinos):
+    """
+    Envia o DataFrame para cada destino configurado.
+
+    Returns:
+        bool: True somente se todos os destinos foram carregados com sucesso.
+    """
+    sucesso = True
+    for destino in destinos:
+        try:
+            if not destino.carregar(df):
+                sucesso = False
+        except Exception as e:
+            print(f"ERRO ao carregar no destino {type(destino).__name__}: {e}")
+            sucesso = False
+    return sucesso
+
+
 # --- Bloco de Execução Principal ---
 def main():
     """Função principal que orquestra todo o pipeline ETL."""
@@ -165,33 +1163,67 @@ def main():
     ID_SPREADSHEET = "157VewSYyGWUZqifKKU0Zt2cxwS7r2wtjaib2znw9_Os" 
     ARQUIVO_CREDENCIAS = "credentials.json"
     NOME_PLANILHA = "Dados de Ações - Desafio"
+    MAX_WORKERS = 8
+    REQUISICOES_POR_SEGUNDO = 10
+    DOWNLOAD_EM_LOTE = True
+    DIRETORIO_CACHE = "cache_yahoofinance"
+    TTL_METADADOS_HORAS = 24
+    # Destinos do carregamento: o histórico completo vai para Parquet e a planilha recebe o resumo
+    CONFIG_DESTINOS = [
+        {'tipo': 'parquet', 'diretorio': 'dados_acoes'},
+        {'tipo': 'gsheets', 'nome_planilha': NOME_PLANILHA, 'id_spreadsheet': ID_SPREADSHEET,
+         'arq_credenciais': ARQUIVO_CREDENCIAS, 'modo': 'incremental', 'resumo': True},
+    ]
     TICKERS_CANDIDATOS = [
         'AAPL', 'MSFT', 'GOOGL', 'AMZN', 'NVDA', 'META', 'TSLA', 'BRK-B',
         'JPM', 'JNJ', 'V', 'UNH', 'LLY', 'XOM', 'WMT', 'PG', 'MA', 'HD',
         'CVX', 'AVGO'
     ]
 
-    if not os.path.exists(ARQUIVO_CREDENCIAS):
+    usa_gsheets = any(config['tipo'] == 'gsheets' for config in CONFIG_DESTINOS)
+    if usa_gsheets and not os.path.exists(ARQUIVO_CREDENCIAS):
         print(f"ERRO: Arquivo de credenciais '{ARQUIVO_CREDENCIAS}' não encontrado.")
         return
 
+    try:
+        destinos = [criar_destino(config) for config in CONFIG_DESTINOS]
+    except (TypeError, ValueError) as e:
+        print(f"ERRO na configuração dos destinos: {e}")
+        return
+
     # 2. EXECUÇÃO DO PIPELINE
-    top_tickers = obter_tickers_maior_market_cap(TICKERS_CANDIDATOS, num_top=10)
+    # Um único repositório de metadados atende a seleção e o enriquecimento
+    limitador = LimitadorTaxa(REQUISICOES_POR_SEGUNDO)
+    cache_metadados = CacheMetadados(os.path.join(DIRETORIO_CACHE, "metadados.json"), ttl_horas=TTL_METADADOS_HORAS)
+    cache_historico = CacheHistorico(os.path.join(DIRETORIO_CACHE, "historico"))
+    metadados = RepositorioMetadados(limitador=limitador, cache=cache_metadados)
+
+    top_tickers = obter_tickers_maior_market_cap(
+        TICKERS_CANDIDATOS, num_top=10, metadados=metadados, max_workers=MAX_WORKERS
+    )
     if not top_tickers:
         print("\nPipeline interrompido: não foi possível definir os top tickers.")
         return
 
-    dados_acoes_enriquecidos = extrair_e_enriquecer_dados(top_tickers)
+    dados_acoes_enriquecidos = extrair_e_enriquecer_dados(
+        top_tickers, max_workers=MAX_WORKERS, metadados=metadados, download_em_lote=DOWNLOAD_EM_LOTE,
+        cache=cache_historico
+    )
+    cache_metadados.salvar()
     if dados_acoes_enriquecidos is None or dados_acoes_enriquecidos.empty:
         print("\nPipeline ETL falhou na etapa de extração.")
         return
 
-    dados_acoes_limpos = transformar_dataframe_final(dados_acoes_enriquecidos)
+    dados_acoes_limpos = transformar_dataframe_final(dados_acoes_enriquecidos, compacto=True)
     if dados_acoes_limpos is None:
         print("\nPipeline ETL falhou na etapa de transformação.")
         return
+    # Só as barras novas têm indicadores calculados; as demais vêm da execução anterior
+    dados_acoes_limpos = calcular_indicadores_incremental(
+        dados_acoes_limpos, os.path.join(DIRETORIO_CACHE, "indicadores.parquet")
+    )
 
-    sucesso = carregar_para_gsheets(dados_acoes_limpos, NOME_PLANILHA, ID_SPREADSHEET, ARQUIVO_CREDENCIAS)
+    sucesso = carregar_em_destinos(dados_acoes_limpos, destinos)
     if sucesso:
         print("\nPipeline ETL concluído com sucesso!")
     else:
@@ -199,4 +1231,9 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Métricas por etapa (e o cProfile) são ligadas pelas variáveis METRICAS_ARQUIVO e METRICAS_PERFIL
+    METRICAS.configurar_pelo_ambiente()
+    try:
+        main()
+    finally:
+        METRICAS.finalizar()
\ No newline at end of file
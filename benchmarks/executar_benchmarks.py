@@ -0,0 +1,251 @@
+"""
+Benchmarks offline das etapas do ETL do Yahoo Finance e da limpeza do ObjetosTeca.
+
+Nada acessa a rede: o yfinance e o gspread são trocados pelos substitutos de
+`fakes.py` e as planilhas vêm de `gerador_planilhas.py`. Cada etapa é medida em
+vários tamanhos de dados e o resultado é gravado em JSON em `benchmarks/resultados`,
+para comparar execuções (opção --comparar).
+
+Uso:
+    python benchmarks/executar_benchmarks.py
+    python benchmarks/executar_benchmarks.py --suites limpeza --linhas 10000 100000 1000000
+    python benchmarks/executar_benchmarks.py --comparar benchmarks/resultados/<anterior>.json
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import warnings
+import contextlib
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'Etl_yahoofinance'))
+sys.path.insert(0, os.path.join(RAIZ, 'limpeza_dados'))
+
+import etl_finance  # noqa: E402
+import limpeza  # noqa: E402
+from fakes import FabricaTickerFalso, ClienteGspreadFalso  # noqa: E402
+from gerador_planilhas import gerar_planilha  # noqa: E402
+
+DIRETORIO_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+
+# Tamanho máximo da amostra usada para conferir `corrigir_datas` contra `corrigir_data_linha`
+AMOSTRA_EQUIVALENCIA_DATAS = 20000
+
+
+def medir(funcao, repeticoes=1):
+    """
+    Executa `funcao` `repeticoes` vezes, sem a saída dos prints, e devolve o menor tempo.
+
+    Returns:
+        tuple: (segundos, resultado da última execução).
+    """
+    melhor = float('inf')
+    resultado = None
+    for _ in range(repeticoes):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            resultado = funcao()
+            melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+class Registro:
+    """Acumula as medições e as mostra à medida que são feitas."""
+
+    def __init__(self):
+        self.resultados = []
+
+    def adicionar(self, suite, etapa, tamanho, segundos, **extras):
+        self.resultados.append({'suite': suite, 'etapa': etapa, 'tamanho': tamanho, 'segundos': round(segundos, 6), **extras})
+        detalhes = ' '.join(f'{chave}={valor}' for chave, valor in extras.items())
+        print(f"  {suite:<8} {etapa:<28} {tamanho:>9} {segundos:>10.4f}s {detalhes}")
+
+
+def _equivalencia_datas(df_base):
+    """Compara `corrigir_datas` com a versão linha a linha numa amostra; devolve (segundos da referência, iguais)."""
+    amostra = df_base.head(AMOSTRA_EQUIVALENCIA_DATAS)
+    segundos, referencia = medir(lambda: amostra.apply(limpeza.corrigir_data_linha, axis=1, result_type='expand'))
+    ano, mes = limpeza.corrigir_datas(amostra)
+    iguais = True
+    for esperado, obtido in ((referencia[0], ano), (referencia[1], mes)):
+        esperado = pd.to_numeric(esperado, errors='coerce')
+        iguais &= bool(((esperado == obtido) | (esperado.isna() & obtido.isna())).all())
+    return segundos, iguais
+
+
+def benchmark_limpeza(registro, tamanhos, num_produtos, repeticoes, diretorio):
+    """Mede leitura, fuzzy matching, correção de datas, limpeza, análise e escrita da limpeza."""
+    print("\n--- Limpeza de dados (ObjetosTeca sintético) ---")
+    for num_linhas in tamanhos:
+        caminho = os.path.join(diretorio, f'objetos_{num_linhas}.xlsx')
+        gerar_planilha(caminho, num_linhas, num_produtos=num_produtos)
+
+        segundos, (df_base, df_skus) = medir(lambda: limpeza.carregar_dados_excel(caminho, usar_cache=False), repeticoes)
+        registro.adicionar('limpeza', 'leitura_excel', num_linhas, segundos)
+
+        pasta_cache = os.path.join(diretorio, 'cache_excel')
+        medir(lambda: limpeza.carregar_dados_excel(caminho, diretorio_cache=pasta_cache))
+        segundos, _ = medir(lambda: limpeza.carregar_dados_excel(caminho, diretorio_cache=pasta_cache), repeticoes)
+        registro.adicionar('limpeza', 'leitura_cache_parquet', num_linhas, segundos)
+
+        catalogo = limpeza.CatalogoSKU(df_skus.copy())
+        nomes_sujos = df_base['Objeto'].dropna().astype(str).str.upper().str.strip().unique()
+        segundos, aceitos = medir(
+            lambda: limpeza.mapear_nomes_fuzzy(nomes_sujos, catalogo.nomes_norm, indice=catalogo.indice), repeticoes
+        )
+        registro.adicionar('limpeza', 'fuzzy_matching', num_linhas, segundos, nomes=len(nomes_sujos), aceitos=len(aceitos))
+
+        # Bloqueio por n-gramas (opcional): tempo e concordância com a busca completa
+        indice = limpeza.construir_indice_ngramas(catalogo.nomes_norm)
+        segundos, aceitos_bloqueio = medir(
+            lambda: limpeza.mapear_nomes_fuzzy(nomes_sujos, catalogo.nomes_norm, limite_bloqueio=0, indice=indice), repeticoes
+        )
+        divergentes = sum(aceitos.get(nome) != aceitos_bloqueio.get(nome) for nome in nomes_sujos)
+        registro.adicionar('limpeza', 'fuzzy_matching_bloqueio', num_linhas, segundos, nomes=len(nomes_sujos),
+                           divergentes=divergentes, concordancia=round(1 - divergentes / max(len(nomes_sujos), 1), 4))
+
+        segundos, _ = medir(lambda: limpeza.corrigir_datas(df_base), repeticoes)
+        segundos_referencia, iguais = _equivalencia_datas(df_base)
+        registro.adicionar('limpeza', 'correcao_datas', num_linhas, segundos, equivalente=iguais)
+        registro.adicionar('limpeza', 'correcao_datas_linha', min(num_linhas, AMOSTRA_EQUIVALENCIA_DATAS), segundos_referencia)
+
+        segundos, (df_limpo, df_rejeitados, _) = medir(
+            lambda: limpeza.limpar_e_unificar_dados(df_base.copy(), df_skus.copy()), repeticoes
+        )
+        registro.adicionar('limpeza', 'limpeza_completa', num_linhas, segundos, limpos=len(df_limpo), rejeitados=len(df_rejeitados))
+
+        segundos, _ = medir(lambda: limpeza.gerar_relatorios(limpeza.construir_cubo_agregado(df_limpo)), repeticoes)
+        registro.adicionar('limpeza', 'analise_cubo', num_linhas, segundos)
+
+        saida = os.path.join(diretorio, f'objetos_{num_linhas}_Limpo.xlsx')
+        segundos, _ = medir(lambda: limpeza.salvar_dados_limpos(df_limpo, df_rejeitados, saida), repeticoes)
+        registro.adicionar('limpeza', 'escrita_excel', num_linhas, segundos)
+
+        caminho_parquet = os.path.join(diretorio, f'objetos_{num_linhas}.parquet')
+        df_base.to_parquet(caminho_parquet, index=False)
+        segundos, resultado = medir(lambda: limpeza.limpar_em_blocos(
+            caminho_parquet, caminho, os.path.join(diretorio, 'blocos_limpos.parquet'),
+            os.path.join(diretorio, 'blocos_rejeitados.parquet'),
+        ), repeticoes)
+        registro.adicionar('limpeza', 'limpeza_em_blocos', num_linhas, segundos, limpos=resultado['num_limpos'])
+
+
+def benchmark_etl(registro, tamanhos, latencia, repeticoes, diretorio):
+    """Mede extração (sequencial, paralela e em lote), transformação, indicadores e carga do ETL."""
+    print(f"\n--- ETL Yahoo Finance (substitutos com latência de {latencia * 1000:.0f} ms) ---")
+    for num_tickers in tamanhos:
+        tickers = [f'T{numero:04d}' for numero in range(num_tickers)]
+        fabrica = FabricaTickerFalso(latencia=latencia)
+
+        for etapa, parametros in (
+            ('extracao_sequencial', {'max_workers': 1}),
+            ('extracao_paralela', {'max_workers': 8}),
+            ('extracao_lote', {'max_workers': 8, 'download_em_lote': True, 'funcao_download': fabrica.download}),
+        ):
+            chamadas_antes = fabrica.contador.total
+            segundos, bruto = medir(lambda: etl_finance.extrair_e_enriquecer_dados(
+                tickers, fabrica_ticker=fabrica, tentativas=1, **parametros
+            ), repeticoes)
+            chamadas = (fabrica.contador.total - chamadas_antes) // repeticoes
+            registro.adicionar('etl', etapa, num_tickers, segundos, linhas=len(bruto), chamadas=chamadas)
+
+        segundos, df = medir(lambda: etl_finance.transformar_dataframe_final(bruto.copy(), compacto=True), repeticoes)
+        registro.adicionar('etl', 'transformacao', num_tickers, segundos, linhas=len(df))
+
+        segundos, df = medir(lambda: etl_finance.calcular_indicadores_tecnicos(df), repeticoes)
+        registro.adicionar('etl', 'indicadores', num_tickers, segundos)
+
+        cliente = ClienteGspreadFalso(latencia=latencia)
+        for etapa, modo in (('carga_gsheets_substituir', 'substituir'), ('carga_gsheets_incremental', 'incremental')):
+            chamadas_antes = cliente.contador.total
+            segundos, _ = medir(lambda: etl_finance.carregar_para_gsheets(
+                df, 'Benchmark', 'planilha-falsa', None, modo=modo, cliente=cliente
+            ), repeticoes)
+            chamadas = (cliente.contador.total - chamadas_antes) // repeticoes
+            registro.adicionar('etl', etapa, num_tickers, segundos, requisicoes=chamadas)
+
+        for tipo, parametros in (
+            ('parquet', {'diretorio': os.path.join(diretorio, f'parquet_{num_tickers}')}),
+            ('sqlite', {'caminho': os.path.join(diretorio, f'etl_{num_tickers}.db')}),
+            ('csv', {'caminho': os.path.join(diretorio, f'etl_{num_tickers}.csv')}),
+        ):
+            destino = etl_finance.criar_destino({'tipo': tipo, **parametros})
+            segundos, _ = medir(lambda: destino.carregar(df), repeticoes)
+            registro.adicionar('etl', f'destino_{tipo}', num_tickers, segundos)
+
+
+def comparar(resultados, caminho_anterior):
+    """Mostra, etapa a etapa, a razão entre o tempo atual e o de uma execução anterior."""
+    with open(caminho_anterior, encoding='utf-8') as arquivo:
+        anteriores = {
+            (r['suite'], r['etapa'], r['tamanho']): r['segundos'] for r in json.load(arquivo)['resultados']
+        }
+    print(f"\n--- Comparação com {caminho_anterior} (atual / anterior) ---")
+    for r in resultados:
+        anterior = anteriores.get((r['suite'], r['etapa'], r['tamanho']))
+        if anterior:
+            razao = r['segundos'] / anterior
+            indicacao = 'mais lento' if razao > 1.1 else 'mais rápido' if razao < 0.9 else 'igual'
+            print(f"  {r['suite']:<8} {r['etapa']:<28} {r['tamanho']:>9} {razao:>6.2f}x  {indicacao}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks offline do ETL e da limpeza de dados.")
+    parser.add_argument('--suites', nargs='+', choices=['etl', 'limpeza'], default=['etl', 'limpeza'])
+    parser.add_argument('--linhas', nargs='+', type=int, default=[10_000, 100_000],
+                        help="Tamanhos das planilhas sintéticas (linhas da aba 'Base').")
+    parser.add_argument('--produtos', type=int, default=30, help="Tamanho do catálogo de SKUs.")
+    parser.add_argument('--tickers', nargs='+', type=int, default=[10, 50, 200],
+                        help="Quantidades de tickers do ETL.")
+    parser.add_argument('--latencia', type=float, default=0.01, help="Latência simulada por chamada, em segundos.")
+    parser.add_argument('--repeticoes', type=int, default=1, help="Execuções por etapa (vale o menor tempo).")
+    parser.add_argument('--saida', default=None, help="Arquivo JSON dos resultados.")
+    parser.add_argument('--comparar', default=None, help="Resultados anteriores (JSON) para comparação.")
+    args = parser.parse_args()
+
+    warnings.simplefilter('ignore')
+    registro = Registro()
+    diretorio = tempfile.mkdtemp(prefix='benchmarks_')
+    try:
+        if 'limpeza' in args.suites:
+            benchmark_limpeza(registro, args.linhas, args.produtos, args.repeticoes, diretorio)
+        if 'etl' in args.suites:
+            benchmark_etl(registro, args.tickers, args.latencia, args.repeticoes, diretorio)
+    finally:
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    saida = args.saida or os.path.join(DIRETORIO_RESULTADOS, f"{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as arquivo:
+        json.dump({
+            'data': datetime.now().isoformat(timespec='seconds'),
+            'ambiente': {
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'numpy': np.__version__,
+                'plataforma': platform.platform(),
+                'nucleos': os.cpu_count(),
+                'motor_excel': limpeza.MOTOR_EXCEL,
+            },
+            'parametros': vars(args),
+            'resultados': registro.resultados,
+        }, arquivo, ensure_ascii=False, indent=2)
+    print(f"\nResultados gravados em: {saida}")
+
+    if args.comparar:
+        comparar(registro.resultados, args.comparar)
+
+
+if __name__ == "__main__":
+    main()
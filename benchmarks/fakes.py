@@ -0,0 +1,246 @@
+"""
+Substitutos locais e determinísticos do yfinance e do gspread, para medir o ETL sem rede.
+
+Os dados gerados dependem apenas do ticker (e da semente), então duas execuções
+produzem exatamente os mesmos valores. A latência de cada chamada é configurável
+para simular o tempo de resposta da rede.
+"""
+
+import re
+import time
+import zlib
+import threading
+
+import numpy as np
+import pandas as pd
+import gspread
+
+SETORES = ['Technology', 'Healthcare', 'Financial Services', 'Energy', 'Consumer Defensive']
+
+
+def _gerador(ticker, semente):
+    """Gerador aleatório próprio do ticker, estável entre execuções."""
+    return np.random.default_rng([zlib.crc32(ticker.encode()), semente])
+
+
+def gerar_historico(ticker, data_inicial, data_final, semente=0):
+    """
+    Gera barras diárias (dias úteis, fuso de Nova York) no formato do `Ticker.history`.
+
+    Cada barra depende apenas do ticker e da data, de modo que períodos sobrepostos
+    devolvem os mesmos valores, como a API real.
+    """
+    datas = pd.bdate_range(pd.Timestamp(data_inicial).normalize(), pd.Timestamp(data_final).normalize(), inclusive='left')
+    indice = datas.tz_localize('America/New_York').rename('Date')
+    if len(datas) == 0:
+        return pd.DataFrame(columns=['Open', 'High', 'Low', 'Close', 'Volume'], index=indice)
+
+    # Ruído determinístico por (ticker, dia): o preço é um passeio a partir de um valor base
+    gerador = _gerador(ticker, semente)
+    base = gerador.uniform(20, 500)
+    dias = (datas - pd.Timestamp('2000-01-01')).days.to_numpy()
+    ruido = np.sin(dias * (0.01 + gerador.uniform(0, 0.05))) * 0.1 + np.cos(dias * 0.003) * 0.05
+    fechamento = base * (1 + ruido)
+    abertura = fechamento * (1 + np.sin(dias * 0.7) * 0.005)
+    return pd.DataFrame({
+        'Open': abertura,
+        'High': np.maximum(abertura, fechamento) * 1.01,
+        'Low': np.minimum(abertura, fechamento) * 0.99,
+        'Close': fechamento,
+        'Volume': (1_000_000 + (dias * 7919) % 5_000_000).astype('int64'),
+    }, index=indice)
+
+
+class TickerFalso:
+    """Substituto de `yf.Ticker`: expõe `.info` e `.history()` com latência simulada."""
+
+    def __init__(self, ticker, latencia=0.0, semente=0, contador=None):
+        self.ticker = ticker
+        self.latencia = latencia
+        self.semente = semente
+        self.contador = contador
+
+    def _chamada(self):
+        if self.contador is not None:
+            self.contador.registrar()
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    @property
+    def info(self):
+        self._chamada()
+        gerador = _gerador(self.ticker, self.semente)
+        return {
+            'marketCap': int(gerador.uniform(1e9, 3e12)),
+            'longName': f'{self.ticker} Corporation',
+            'sector': SETORES[zlib.crc32(self.ticker.encode()) % len(SETORES)],
+            'industry': 'Industria Sintetica',
+        }
+
+    def history(self, start=None, end=None, auto_adjust=True, **kwargs):
+        self._chamada()
+        return gerar_historico(self.ticker, start, end, self.semente)
+
+
+class ContadorChamadas:
+    """Conta as chamadas feitas aos substitutos, de forma segura entre threads."""
+
+    def __init__(self):
+        self.total = 0
+        self._trava = threading.Lock()
+
+    def registrar(self):
+        with self._trava:
+            self.total += 1
+
+
+class FabricaTickerFalso:
+    """
+    Fábrica compatível com o parâmetro `fabrica_ticker` do ETL.
+
+    Args:
+        latencia (float): Segundos de espera em cada chamada a `.info` ou `.history()`.
+        semente (int): Semente dos dados gerados.
+    """
+
+    def __init__(self, latencia=0.0, semente=0):
+        self.latencia = latencia
+        self.semente = semente
+        self.contador = ContadorChamadas()
+
+    def __call__(self, ticker):
+        return TickerFalso(ticker, self.latencia, self.semente, self.contador)
+
+    def download(self, tickers, start=None, end=None, group_by='ticker', **kwargs):
+        """
+        Substituto de `yf.download(group_by='ticker')`: uma única chamada (e latência) para todos.
+
+        Como o `yf.download` diário, devolve as datas sem fuso horário.
+        """
+        self.contador.registrar()
+        if self.latencia:
+            time.sleep(self.latencia)
+        historicos = {ticker: gerar_historico(ticker, start, end, self.semente).tz_localize(None) for ticker in tickers}
+        return pd.concat(historicos, axis=1)
+
+
+def gerar_historico_bruto(num_tickers, data_inicial, data_final, semente=0):
+    """
+    Monta diretamente o DataFrame que a extração entrega (histórico enriquecido de todos os tickers).
+
+    Permite medir transformação, indicadores e carga em tamanhos maiores que a extração
+    simulada, sem passar pelas chamadas falsas.
+    """
+    fabrica = FabricaTickerFalso(semente=semente)
+    partes = []
+    for numero in range(num_tickers):
+        ticker = f'T{numero:04d}'
+        info = fabrica(ticker).info
+        historico = gerar_historico(ticker, data_inicial, data_final, semente)
+        historico['ticker'] = ticker
+        historico['nome_empresa'] = info['longName']
+        historico['setor'] = info['sector']
+        historico['industria'] = info['industry']
+        partes.append(historico)
+    return pd.concat(partes).reset_index()
+
+
+class AbaFalsa:
+    """Aba em memória com a parte da API do `gspread.Worksheet` usada pelo ETL."""
+
+    def __init__(self, titulo, rows, cols, id_aba, latencia=0.0, contador=None):
+        self.title = titulo
+        self.id = id_aba
+        self.row_count = rows
+        self.col_count = cols
+        self.latencia = latencia
+        self.contador = contador
+        self.celulas_enviadas = 0
+        self._linhas = []
+
+    def _requisicao(self):
+        if self.contador is not None:
+            self.contador.registrar()
+        if self.latencia:
+            time.sleep(self.latencia)
+
+    @staticmethod
+    def _linha_do_intervalo(intervalo):
+        return int(re.match(r'[A-Z]+(\d+)', intervalo).group(1))
+
+    def _gravar(self, linha_inicial, valores):
+        fim = linha_inicial - 1 + len(valores)
+        # Como a API, recusa escrever fora da grade; a aba só cresce com `resize`
+        if fim > self.row_count or any(len(linha) > self.col_count for linha in valores):
+            raise ValueError(f"Intervalo excede os limites da grade da aba '{self.title}' "
+                             f"({self.row_count} linhas x {self.col_count} colunas).")
+        if fim > len(self._linhas):
+            self._linhas.extend([[] for _ in range(fim - len(self._linhas))])
+        for deslocamento, linha in enumerate(valores):
+            self._linhas[linha_inicial - 1 + deslocamento] = [str(valor) for valor in linha]
+            self.celulas_enviadas += len(linha)
+
+    def clear(self):
+        self._requisicao()
+        self._linhas = []
+
+    def resize(self, rows=None, cols=None):
+        self._requisicao()
+        self.row_count = rows if rows is not None else self.row_count
+        self.col_count = cols if cols is not None else self.col_count
+        del self._linhas[self.row_count:]
+
+    def update(self, range_name='A1', values=None, **kwargs):
+        self._requisicao()
+        self._gravar(self._linha_do_intervalo(range_name), values or [])
+
+    def batch_update(self, atualizacoes, **kwargs):
+        self._requisicao()
+        for atualizacao in atualizacoes:
+            self._gravar(self._linha_do_intervalo(atualizacao['range']), atualizacao['values'])
+
+    def get_all_values(self, **kwargs):
+        self._requisicao()
+        # Como a API, omite as linhas vazias do final
+        linhas = [list(linha) for linha in self._linhas]
+        while linhas and not any(linhas[-1]):
+            linhas.pop()
+        return linhas
+
+
+class PlanilhaFalsa:
+    """Planilha em memória: guarda as abas por título."""
+
+    def __init__(self, latencia=0.0, contador=None):
+        self.latencia = latencia
+        self.contador = contador
+        self.abas = {}
+
+    def worksheet(self, titulo):
+        if titulo not in self.abas:
+            raise gspread.exceptions.WorksheetNotFound(titulo)
+        return self.abas[titulo]
+
+    def add_worksheet(self, title, rows, cols, **kwargs):
+        aba = AbaFalsa(title, rows, cols, len(self.abas), self.latencia, self.contador)
+        self.abas[title] = aba
+        return aba
+
+
+class ClienteGspreadFalso:
+    """
+    Substituto do cliente do gspread, aceito pelo parâmetro `cliente` de `carregar_para_gsheets`.
+
+    Args:
+        latencia (float): Segundos de espera em cada requisição à aba.
+    """
+
+    def __init__(self, latencia=0.0):
+        self.latencia = latencia
+        self.contador = ContadorChamadas()
+        self.planilhas = {}
+
+    def open_by_key(self, chave):
+        if chave not in self.planilhas:
+            self.planilhas[chave] = PlanilhaFalsa(self.latencia, self.contador)
+        return self.planilhas[chave]
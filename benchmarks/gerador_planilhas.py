@@ -0,0 +1,151 @@
+"""
+Gerador de planilhas sintéticas no formato do `ObjetosTeca.xlsx` (abas 'Base' e 'SKUS').
+
+A sujeira é controlada por taxas: nomes com erros de digitação, produtos fora do
+catálogo, objetos vazios, datas quebradas e os placeholders 'YY' e '9999' no ano.
+A mesma semente gera sempre a mesma planilha.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+PRODUTOS_PADRAO = [
+    'AGULHA', 'APITO', 'BICICLETA', 'BOLSA', 'BOTA', 'CACHIMBO', 'CADERNO', 'CANETA', 'CARRO', 'CELULAR',
+    'COPO', 'DADO', 'DISCO', 'ESPELHO', 'FONE DE OUVIDO', 'GARRAFA', 'LANTERNA', 'LIVRO', 'MOCHILA', 'MOEDA',
+    'OCULOS', 'PENTE', 'RELOGIO', 'SAPATO', 'TECLADO', 'TELEVISÃO', 'TESOURA', 'VIOLÃO', 'XADREZ', 'XÍCARA',
+]
+
+NOMES_MESES = ['Janeiro', 'Fevereiro', 'Março', 'Abril', 'Maio', 'Junho', 'Julho', 'Agosto',
+               'Setembro', 'Outubro', 'Novembro', 'Dezembro']
+
+SILABAS = ['BA', 'CE', 'DI', 'FO', 'GU', 'LA', 'ME', 'NI', 'PO', 'RU', 'SA', 'TE', 'VI', 'ZO', 'CRA', 'TRE']
+
+
+def gerar_catalogo(num_produtos=30, semente=0):
+    """
+    Gera a aba 'SKUS'. Até 30 produtos usa os nomes do arquivo real; acima disso
+    completa com nomes sintéticos únicos, para medir o fuzzy matching com catálogos grandes.
+    """
+    nomes = PRODUTOS_PADRAO[:num_produtos]
+    gerador = np.random.default_rng(semente)
+    vistos = set(nomes)
+    while len(nomes) < num_produtos:
+        nome = ''.join(gerador.choice(SILABAS, size=gerador.integers(3, 6)))
+        if nome not in vistos:
+            vistos.add(nome)
+            nomes.append(nome)
+    return pd.DataFrame({'SKU': np.arange(1001, 1001 + len(nomes)), 'Nome': nomes})
+
+
+def _com_erro_de_digitacao(nome, gerador):
+    """Troca, remove ou duplica uma letra do nome."""
+    if len(nome) < 3:
+        return nome
+    posicao = int(gerador.integers(1, len(nome) - 1))
+    operacao = gerador.integers(0, 3)
+    if operacao == 0:
+        return nome[:posicao] + chr(ord('A') + int(gerador.integers(0, 26))) + nome[posicao + 1:]
+    if operacao == 1:
+        return nome[:posicao] + nome[posicao + 1:]
+    return nome[:posicao] + nome[posicao] + nome[posicao:]
+
+
+def _variar_caixa(nome, gerador):
+    """Escreve o nome como no arquivo real: maiúsculas, minúsculas ou só a inicial maiúscula."""
+    return [nome.upper(), nome.lower(), nome.title()][int(gerador.integers(0, 3))]
+
+
+def gerar_base(num_linhas, catalogo, ano=2022, taxa_erros_nome=0.1, taxa_desconhecidos=0.005,
+               taxa_vazios=0.005, taxa_datas_quebradas=0.05, taxa_placeholders=0.01, semente=0):
+    """
+    Gera a aba 'Base' com `num_linhas` linhas.
+
+    Args:
+        num_linhas (int): Número de linhas.
+        catalogo (pd.DataFrame): Aba 'SKUS' de onde vêm os nomes dos produtos.
+        ano (int): Ano das datas geradas.
+        taxa_erros_nome (float): Fração de objetos com erro de digitação.
+        taxa_desconhecidos (float): Fração de objetos que não existem no catálogo.
+        taxa_vazios (float): Fração de objetos vazios ou só com espaços.
+        taxa_datas_quebradas (float): Fração de datas irreconhecíveis (a data vem de 'Ano'/'Mês').
+        taxa_placeholders (float): Fração, entre as datas quebradas, com 'YY' ou '9999' no ano.
+        semente (int): Semente do gerador.
+
+    Returns:
+        pd.DataFrame: Colunas Data, Mês, Ano, Objeto, Investido, Cliques, Receita e Conversões.
+    """
+    gerador = np.random.default_rng(semente)
+    nomes = catalogo['Nome'].to_numpy()
+
+    # Objetos: nome do catálogo com caixa variada, erros de digitação, desconhecidos e vazios
+    objetos = [_variar_caixa(nome, gerador) for nome in gerador.choice(nomes, size=num_linhas)]
+    sorteio = gerador.random(num_linhas)
+    for i in np.flatnonzero(sorteio < taxa_erros_nome):
+        objetos[i] = _com_erro_de_digitacao(objetos[i], gerador)
+    limite = taxa_erros_nome + taxa_desconhecidos
+    for i in np.flatnonzero((sorteio >= taxa_erros_nome) & (sorteio < limite)):
+        objetos[i] = f'QWZX{i % 97}'
+    for i in np.flatnonzero((sorteio >= limite) & (sorteio < limite + taxa_vazios)):
+        objetos[i] = '   ' if i % 2 else None
+
+    # Datas em três formatos, com mês e ano nas colunas próprias em formatos variados
+    datas = pd.Timestamp(f'{ano}-01-01') + pd.to_timedelta(gerador.integers(0, 365, size=num_linhas), unit='D')
+    formato = gerador.integers(0, 3, size=num_linhas)
+    texto_datas = np.where(
+        formato == 0, datas.strftime('%m/%d/%Y'), np.where(formato == 1, datas.strftime('%d-%m-%Y'), datas.strftime('%d/%m/%Y'))
+    ).astype(object)
+    meses = np.where(gerador.random(num_linhas) < 0.5, datas.month.astype(str), np.array(NOMES_MESES)[datas.month - 1]).astype(object)
+    anos = np.where(gerador.random(num_linhas) < 0.8, str(ano), str(ano % 100)).astype(object)
+
+    quebradas = gerador.random(num_linhas) < taxa_datas_quebradas
+    texto_datas[quebradas] = 'xx/xx/xxxx'
+    placeholders = quebradas & (gerador.random(num_linhas) < taxa_placeholders / max(taxa_datas_quebradas, 1e-9))
+    anos[placeholders] = np.where(gerador.random(int(placeholders.sum())) < 0.5, 'YY', '9999')
+
+    cliques = gerador.integers(0, 20000, size=num_linhas)
+    return pd.DataFrame({
+        'Data': texto_datas,
+        'Mês': meses,
+        'Ano': anos,
+        'Objeto': objetos,
+        'Investido': np.round(gerador.uniform(0, 10000, size=num_linhas), 2),
+        'Cliques': cliques,
+        'Receita': np.round(gerador.uniform(0, 50000, size=num_linhas), 2),
+        'Conversões': (cliques * gerador.uniform(0, 0.05, size=num_linhas)).astype(int),
+    })
+
+
+def _escrever_aba(workbook, df, titulo):
+    aba = workbook.create_sheet(title=titulo)
+    aba.append(list(df.columns))
+    for linha in df.itertuples(index=False):
+        aba.append([None if pd.isna(valor) else valor for valor in linha])
+    return aba
+
+
+def salvar_planilha(df_base, df_skus, caminho_arquivo):
+    """Grava as abas 'Base' e 'SKUS' em xlsx, no modo write-only do openpyxl."""
+    os.makedirs(os.path.dirname(os.path.abspath(caminho_arquivo)), exist_ok=True)
+    workbook = Workbook(write_only=True)
+    _escrever_aba(workbook, df_base, 'Base')
+    _escrever_aba(workbook, df_skus, 'SKUS')
+    workbook.save(caminho_arquivo)
+    return caminho_arquivo
+
+
+def gerar_planilha(caminho_arquivo, num_linhas, num_produtos=30, semente=0, **taxas):
+    """
+    Gera e grava uma planilha completa no formato do ObjetosTeca.
+
+    As `taxas` são repassadas a `gerar_base`.
+
+    Returns:
+        tuple: (df_base, df_skus) gravados.
+    """
+    df_skus = gerar_catalogo(num_produtos, semente)
+    df_base = gerar_base(num_linhas, df_skus, semente=semente, **taxas)
+    salvar_planilha(df_base, df_skus, caminho_arquivo)
+    return df_base, df_skus
@@ -0,0 +1,390 @@
+"""
+Instrumentação leve das etapas dos pipelines (ETL do Yahoo Finance e limpeza de dados).
+
+Cada função de etapa é decorada com `@etapa`; com a coleta ativa, cada execução grava
+tempo de parede, linhas de entrada e saída, pico de memória e eventuais erros. Chamadas
+individuais (um download por ticker, uma requisição ao Google Sheets) são medidas com
+`cronometrar`. Os eventos são gravados em JSON Lines, um por linha, e ao final um
+resumo por etapa e por tipo de chamada é acrescentado ao arquivo e exibido no terminal.
+
+A coleta fica desligada por padrão e, assim, o custo é só o de uma verificação por
+chamada. Para ligá-la em uma execução, sem alterar o código:
+
+    METRICAS_ARQUIVO=metricas.jsonl python limpeza_dados/limpeza.py
+    METRICAS_PERFIL=execucao.prof python Etl_yahoofinance/etl_finance.py
+
+`METRICAS_PERFIL` liga também o cProfile. O pico de memória vem, por padrão, de uma
+thread que amostra a memória residente do processo (inclui numpy e Arrow, custo
+desprezível); `METRICAS_MEMORIA=tracemalloc` mede só o heap do Python, com precisão
+por alocação, mas deixa o código várias vezes mais lento, e `METRICAS_MEMORIA=0` desliga.
+
+Processos de trabalho (como os do `processar_lote`) recebem a configuração com
+`estado_para_processo`/`configurar_processo` e devolvem suas medições com
+`extrair_medicoes`, que o processo principal junta ao resumo com `incorporar`.
+"""
+
+import os
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import threading
+import functools
+import contextlib
+import tracemalloc
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_NULO = contextlib.nullcontext()
+_TAMANHO_PAGINA = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+# Intervalo entre as amostras de memória residente, em segundos
+INTERVALO_AMOSTRAGEM_MEMORIA = 0.01
+
+
+def _contar_linhas(objeto):
+    """Número de linhas de um DataFrame/Series, de uma lista ou do primeiro DataFrame de uma tupla."""
+    if hasattr(objeto, 'shape') and hasattr(objeto, 'index'):
+        return int(len(objeto))
+    if isinstance(objeto, tuple):
+        for item in objeto:
+            if hasattr(item, 'shape') and hasattr(item, 'index'):
+                return int(len(item))
+        return None
+    if isinstance(objeto, (list, set)):
+        return len(objeto)
+    return None
+
+
+def _linhas_entrada(args, kwargs):
+    """Linhas do primeiro argumento tabular (DataFrame, Series ou lista) da chamada."""
+    for valor in list(args) + list(kwargs.values()):
+        linhas = None if isinstance(valor, tuple) else _contar_linhas(valor)
+        if linhas is not None:
+            return linhas
+    return None
+
+
+def _rss_atual():
+    """Memória residente atual do processo, em bytes; None onde não há /proc (macOS, Windows)."""
+    try:
+        with open('/proc/self/statm') as arquivo:
+            return int(arquivo.read().split()[1]) * _TAMANHO_PAGINA
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _rss_maximo_mb():
+    """Maior memória residente do processo até agora, em MB (indisponível no Windows)."""
+    if resource is None:
+        return None
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux informa em KB; macOS, em bytes
+    return round(maximo / 1024 ** (2 if os.uname().sysname == 'Darwin' else 1), 1)
+
+
+def _percentil(valores_ordenados, fracao):
+    posicao = min(len(valores_ordenados) - 1, int(round(fracao * (len(valores_ordenados) - 1))))
+    return valores_ordenados[posicao]
+
+
+class ColetorMetricas:
+    """
+    Coleta as métricas das etapas e chamadas de uma execução.
+
+    Um único coletor (`METRICAS`) é compartilhado pelo processo; é seguro entre threads.
+    O pico de memória só é medido para etapas executadas na thread principal; é o quanto
+    a memória subiu, no máximo, em relação ao início da etapa. Após um `fork`, o processo
+    filho recria a trava e a thread de amostragem e começa com as medições vazias.
+    """
+
+    def __init__(self):
+        self.ativa = False
+        self.caminho_arquivo = None
+        self.execucao = None
+        self.memoria = None
+        self._caminho_perfil = None
+        self._perfilador = None
+        self._trava = threading.Lock()
+        self._amostrador = None
+        self._etapas = {}
+        self._chamadas = {}
+        self._picos = []
+
+    def configurar(self, caminho_arquivo=None, memoria='rss', caminho_perfil=None):
+        """
+        Liga a coleta para esta execução.
+
+        Args:
+            caminho_arquivo (str, optional): Arquivo JSON Lines dos eventos; sem ele, só o
+                resumo é exibido.
+            memoria (str, optional): 'rss' (memória residente amostrada), 'tracemalloc'
+                (heap do Python) ou None para não medir.
+            caminho_perfil (str, optional): Liga o cProfile e grava as estatísticas neste arquivo.
+        """
+        self.ativa = True
+        self.caminho_arquivo = caminho_arquivo
+        self.execucao = uuid.uuid4().hex[:12]
+        self.memoria = memoria
+        if memoria == 'tracemalloc' and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        elif memoria == 'rss':
+            self._iniciar_amostrador()
+        if caminho_perfil:
+            self._caminho_perfil = caminho_perfil
+            self._perfilador = cProfile.Profile()
+            self._perfilador.enable()
+
+    def configurar_pelo_ambiente(self):
+        """Liga a coleta se METRICAS_ARQUIVO ou METRICAS_PERFIL estiverem definidas."""
+        caminho_arquivo = os.environ.get('METRICAS_ARQUIVO')
+        caminho_perfil = os.environ.get('METRICAS_PERFIL')
+        if caminho_arquivo or caminho_perfil:
+            memoria = os.environ.get('METRICAS_MEMORIA', 'rss')
+            self.configurar(caminho_arquivo, memoria=None if memoria == '0' else memoria, caminho_perfil=caminho_perfil)
+
+    def estado_para_processo(self):
+        """Configuração a repassar a um processo de trabalho (None com a coleta desligada)."""
+        if not self.ativa:
+            return None
+        return {'caminho_arquivo': self.caminho_arquivo, 'memoria': self.memoria, 'execucao': self.execucao}
+
+    def configurar_processo(self, estado):
+        """Liga a coleta em um processo de trabalho com a configuração do processo principal (sem cProfile)."""
+        if estado is None:
+            return
+        self.configurar(estado['caminho_arquivo'], memoria=estado['memoria'])
+        # Os eventos do processo ficam na mesma execução do principal
+        self.execucao = estado['execucao']
+
+    def extrair_medicoes(self):
+        """Retorna e zera as medições acumuladas, para enviá-las a outro processo."""
+        with self._trava:
+            medicoes = {'etapas': self._etapas, 'chamadas': self._chamadas}
+            self._etapas, self._chamadas = {}, {}
+        return medicoes
+
+    def incorporar(self, medicoes):
+        """Acrescenta ao resumo as medições extraídas de um processo de trabalho."""
+        if not self.ativa or not medicoes:
+            return
+        with self._trava:
+            for destino, origem in ((self._etapas, medicoes['etapas']), (self._chamadas, medicoes['chamadas'])):
+                for nome, valores in origem.items():
+                    destino.setdefault(nome, []).extend(valores)
+
+    def _apos_fork(self):
+        """No processo filho: a trava pode ter sido copiada travada e a thread de amostragem não existe."""
+        self._trava = threading.Lock()
+        self._amostrador = None
+        self._picos = []
+        self._etapas = {}
+        self._chamadas = {}
+        if self.ativa and self.memoria == 'rss':
+            self._iniciar_amostrador()
+
+    def _iniciar_amostrador(self):
+        if _rss_atual() is None or (self._amostrador is not None and self._amostrador.is_alive()):
+            return
+        self._amostrador = threading.Thread(target=self._amostrar_memoria, daemon=True)
+        self._amostrador.start()
+
+    def _gravar(self, evento):
+        if not self.caminho_arquivo:
+            return
+        evento = {'execucao': self.execucao, 'pid': os.getpid(), **evento}
+        linha = json.dumps(evento, ensure_ascii=False, default=str) + '\n'
+        with self._trava:
+            with open(self.caminho_arquivo, 'a', encoding='utf-8') as arquivo:
+                arquivo.write(linha)
+
+    def _amostrar_memoria(self):
+        """Thread de amostragem: atualiza o pico de todas as etapas em andamento."""
+        while self.ativa and self.memoria == 'rss':
+            atual = _rss_atual()
+            with self._trava:
+                self._picos = [max(pico, atual) for pico in self._picos]
+            time.sleep(INTERVALO_AMOSTRAGEM_MEMORIA)
+
+    def _memoria_atual(self):
+        if self.memoria == 'tracemalloc' and tracemalloc.is_tracing():
+            return tracemalloc.get_traced_memory()
+        if self.memoria == 'rss':
+            atual = _rss_atual()
+            return None if atual is None else (atual, atual)
+        return None
+
+    def _inicio_memoria(self):
+        if threading.current_thread() is not threading.main_thread():
+            return None
+        medida = self._memoria_atual()
+        if medida is None:
+            return None
+        atual, pico = medida
+        with self._trava:
+            # O pico já observado é guardado para a etapa externa antes de ser zerado
+            if self._picos:
+                self._picos[-1] = max(self._picos[-1], pico)
+            if self.memoria == 'tracemalloc':
+                tracemalloc.reset_peak()
+            self._picos.append(atual)
+        return atual
+
+    def _fim_memoria(self, inicial):
+        if inicial is None:
+            return None
+        medida = self._memoria_atual()
+        with self._trava:
+            pico = max(medida[1] if medida else 0, self._picos.pop())
+            if self._picos:
+                self._picos[-1] = max(self._picos[-1], pico)
+        return round((pico - inicial) / 1024 ** 2, 2)
+
+    def _acumular(self, destino, nome, segundos, **extras):
+        with self._trava:
+            destino.setdefault(nome, []).append((segundos, extras))
+
+    def etapa(self, nome=None, linhas_saida=None):
+        """
+        Decorador de etapa: `@etapa` ou `@etapa('nome', linhas_saida=funcao)`.
+
+        Args:
+            nome (str, optional): Nome da etapa; padrão, o nome qualificado da função.
+            linhas_saida (callable, optional): Extrai o número de linhas do retorno, quando
+                ele não é um DataFrame nem uma tupla que comece por um.
+        """
+        if callable(nome):
+            return self.etapa()(nome)
+
+        def decorador(funcao):
+            nome_etapa = nome or funcao.__qualname__
+
+            @functools.wraps(funcao)
+            def envoltorio(*args, **kwargs):
+                if not self.ativa:
+                    return funcao(*args, **kwargs)
+
+                memoria_inicial = self._inicio_memoria()
+                data_inicio = datetime.now()
+                inicio = time.perf_counter()
+                erro = None
+                resultado = None
+                try:
+                    resultado = funcao(*args, **kwargs)
+                    return resultado
+                except Exception as e:
+                    erro = f"{type(e).__name__}: {e}"
+                    raise
+                finally:
+                    segundos = time.perf_counter() - inicio
+                    pico = self._fim_memoria(memoria_inicial)
+                    saida = None
+                    if erro is None:
+                        try:
+                            saida = linhas_saida(resultado) if linhas_saida else _contar_linhas(resultado)
+                        except Exception:
+                            saida = None
+                    self._acumular(self._etapas, nome_etapa, segundos, pico_memoria_mb=pico)
+                    self._gravar({
+                        'tipo': 'etapa',
+                        'etapa': nome_etapa,
+                        'inicio': data_inicio.isoformat(timespec='milliseconds'),
+                        'segundos': round(segundos, 6),
+                        'linhas_entrada': _linhas_entrada(args, kwargs),
+                        'linhas_saida': saida,
+                        'pico_memoria_mb': pico,
+                        'rss_max_mb': _rss_maximo_mb(),
+                        'erro': erro,
+                    })
+            return envoltorio
+        return decorador
+
+    def cronometrar(self, nome, **rotulos):
+        """Mede uma chamada individual (ex.: `with cronometrar('history', ticker=t):`)."""
+        if not self.ativa:
+            return _NULO
+        return self._cronometro(nome, rotulos)
+
+    @contextlib.contextmanager
+    def _cronometro(self, nome, rotulos):
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            yield
+        except Exception as e:
+            erro = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            segundos = time.perf_counter() - inicio
+            self._acumular(self._chamadas, nome, segundos)
+            self._gravar({'tipo': 'chamada', 'chamada': nome, 'segundos': round(segundos, 6), 'erro': erro, **rotulos})
+
+    def resumo(self):
+        """
+        Agrega as medições da execução.
+
+        Returns:
+            dict: 'etapas' (execuções, tempo total e máximo, maior pico de memória) e
+            'chamadas' (quantidade, total, média, p50, p95 e máximo), por nome.
+        """
+        with self._trava:
+            etapas = {
+                nome: {
+                    'execucoes': len(medicoes),
+                    'segundos_total': round(sum(s for s, _ in medicoes), 6),
+                    'segundos_max': round(max(s for s, _ in medicoes), 6),
+                    'pico_memoria_mb': max((e['pico_memoria_mb'] for _, e in medicoes if e['pico_memoria_mb'] is not None), default=None),
+                }
+                for nome, medicoes in self._etapas.items()
+            }
+            chamadas = {}
+            for nome, medicoes in self._chamadas.items():
+                tempos = sorted(s for s, _ in medicoes)
+                chamadas[nome] = {
+                    'quantidade': len(tempos),
+                    'segundos_total': round(sum(tempos), 6),
+                    'media': round(sum(tempos) / len(tempos), 6),
+                    'p50': round(_percentil(tempos, 0.5), 6),
+                    'p95': round(_percentil(tempos, 0.95), 6),
+                    'max': round(tempos[-1], 6),
+                }
+        return {'etapas': etapas, 'chamadas': chamadas, 'rss_max_mb': _rss_maximo_mb()}
+
+    def finalizar(self):
+        """Encerra a coleta: grava e exibe o resumo e, se ligado, o perfil do cProfile."""
+        if not self.ativa:
+            return None
+        resumo = self.resumo()
+        self._gravar({'tipo': 'resumo', **resumo})
+
+        print("\n--- MÉTRICAS DA EXECUÇÃO ---")
+        for nome, dados in sorted(resumo['etapas'].items(), key=lambda item: -item[1]['segundos_total']):
+            memoria = f", pico {dados['pico_memoria_mb']:.1f} MB" if dados['pico_memoria_mb'] is not None else ''
+            print(f"{nome}: {dados['segundos_total']:.3f}s em {dados['execucoes']} execução(ões){memoria}")
+        for nome, dados in resumo['chamadas'].items():
+            print(f"{nome}: {dados['quantidade']} chamadas, p50 {dados['p50'] * 1000:.1f} ms, p95 {dados['p95'] * 1000:.1f} ms")
+        if self.caminho_arquivo:
+            print(f"Métricas gravadas em: {self.caminho_arquivo}")
+
+        if self._perfilador is not None:
+            self._perfilador.disable()
+            self._perfilador.dump_stats(self._caminho_perfil)
+            print(f"Perfil gravado em: {self._caminho_perfil} (as 15 funções mais custosas abaixo)")
+            pstats.Stats(self._perfilador).sort_stats('cumulative').print_stats(15)
+            self._perfilador = None
+
+        self.ativa = False
+        return resumo
+
+
+# Coletor do processo, compartilhado pelos dois pipelines
+METRICAS = ColetorMetricas()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=METRICAS._apos_fork)
+etapa = METRICAS.etapa
+cronometrar = METRICAS.cronometrar
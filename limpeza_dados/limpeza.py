@@ -1,36 +1,598 @@
 # Importação de Bibliotecas 
 
+import os
+import sys
+import glob
+import datetime
+import json
+import hashlib
+import importlib.util
+import multiprocessing
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from concurrent.futures import ProcessPoolExecutor
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils import get_column_letter
 import numpy as np 
 from rapidfuzz import process, fuzz
 
-def carregar_dados_excel(caminho_arquivo):
-    """Carrega os dados das abas 'Base' e 'SKUS' de um arquivo Excel."""
+# A instrumentação é compartilhada com o ETL e fica na raiz do projeto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from instrumentacao import METRICAS, etapa  # noqa: E402
+
+# O calamine (python-calamine) lê xlsx muitas vezes mais rápido que o openpyxl; é usado quando instalado
+MOTOR_EXCEL = 'calamine' if importlib.util.find_spec('python_calamine') else 'openpyxl'
+
+# Colunas usadas pela limpeza; as de texto são lidas como object para preservar os valores brutos.
+# Da aba 'Base' do Excel todas as colunas são lidas, pois vão para a auditoria dos rejeitados
+COLUNAS_BASE = ['Data', 'Mês', 'Ano', 'Objeto', 'Investido', 'Cliques', 'Receita', 'Conversões']
+COLUNAS_TEXTO_BASE = ['Data', 'Mês', 'Ano', 'Objeto']
+COLUNAS_SKUS = ['SKU', 'Nome']
+
+# Memória máxima da matriz de scores de cada lote do cdist (float64); limita o lote em catálogos grandes
+MAX_BYTES_MATRIZ_CDIST = 64 * 1024 * 1024
+
+# Versão do formato do cache; deve mudar sempre que a leitura ou a normalização mudar
+VERSAO_CACHE_EXCEL = '2'
+
+# Tipos de célula de colunas object guardados como texto no cache, com a função que os restaura
+TIPOS_CELULA_CACHE = {
+    'int': int,
+    'float': float,
+    'bool': lambda texto: texto == 'True',
+    'datetime': datetime.datetime.fromisoformat,
+    'date': datetime.date.fromisoformat,
+    'time': datetime.time.fromisoformat,
+    'Timestamp': pd.Timestamp,
+}
+
+def _hash_arquivo(caminho_arquivo, tamanho_bloco=1024 * 1024):
+    """Calcula o SHA-256 do conteúdo do arquivo, lendo-o em blocos."""
+    sha = hashlib.sha256()
+    with open(caminho_arquivo, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(tamanho_bloco), b''):
+            sha.update(bloco)
+    return sha.hexdigest()
+
+def _hash_tabela(df):
+    """Calcula o SHA-256 do conteúdo de um DataFrame (valores como texto, sem o índice)."""
+    valores = pd.util.hash_pandas_object(df.astype(str), index=False).to_numpy()
+    return hashlib.sha256(valores.tobytes()).hexdigest()
+
+def _normalizar_texto(serie):
+    """
+    Converte uma coluna de tipos mistos (int, str, data) em texto, mantendo os vazios.
+
+    O Parquet não aceita colunas com tipos misturados. As regras de limpeza já
+    trabalham sobre `str(valor)`; datas viram 'dd/mm/aaaa', que a leitura com
+    dayfirst=True interpreta com o mesmo dia e mês.
+    """
+    def para_texto(valor):
+        if hasattr(valor, 'strftime'):
+            return valor.strftime('%d/%m/%Y')
+        return str(valor)
+    return serie.map(para_texto, na_action='ignore').astype(object)
+
+def _ler_abas_excel(caminho_arquivo):
+    """
+    Abre o arquivo uma única vez e lê a aba 'Base' inteira e as colunas usadas da aba 'SKUS'.
+
+    Só as colunas de texto da limpeza têm o tipo fixado (object, com os valores brutos
+    das células); as demais seguem a inferência do pandas, como na leitura original.
+    """
+    with pd.ExcelFile(caminho_arquivo, engine=MOTOR_EXCEL) as arquivo_excel:
+        df_base = arquivo_excel.parse('Base', dtype={col: object for col in COLUNAS_TEXTO_BASE})
+        df_skus = arquivo_excel.parse(
+            'SKUS', usecols=lambda col: col in COLUNAS_SKUS, dtype={'Nome': object}
+        )
+    return df_base, df_skus
+
+def _para_cache(df):
+    """
+    Prepara uma aba para o Parquet do cache, que não aceita colunas com tipos misturados.
+
+    Cada coluna object com valores que não são texto é gravada como texto, acompanhada
+    de uma coluna '<coluna>__tipo' com o tipo original de cada célula.
+    """
+    df = df.copy()
+    for col in [col for col in df.columns if df[col].dtype == object]:
+        tipos = df[col].map(lambda valor: type(valor).__name__, na_action='ignore')
+        if (tipos.dropna() == 'str').all():
+            continue
+        df[col] = df[col].map(
+            lambda valor: valor.isoformat() if hasattr(valor, 'isoformat') else str(valor), na_action='ignore'
+        ).astype(object)
+        df[f'{col}__tipo'] = tipos.astype(object)
+    return df
+
+def _do_cache(df):
+    """Desfaz `_para_cache`, devolvendo as células aos tipos e vazios (NaN) da leitura do Excel."""
+    for col_tipo in [col for col in df.columns if col.endswith('__tipo')]:
+        col = col_tipo[:-len('__tipo')]
+        df[col] = pd.Series([
+            TIPOS_CELULA_CACHE[tipo](valor) if tipo in TIPOS_CELULA_CACHE else valor
+            for valor, tipo in zip(df[col], df[col_tipo])
+        ], index=df.index, dtype=object)
+        df.drop(columns=col_tipo, inplace=True)
+    for col in [col for col in df.columns if df[col].dtype == object]:
+        df[col] = df[col].where(df[col].notna(), np.nan)
+    return df
+
+@etapa
+def carregar_dados_excel(caminho_arquivo, diretorio_cache=None, usar_cache=True):
+    """
+    Carrega os dados das abas 'Base' e 'SKUS' de um arquivo Excel.
+
+    As abas lidas são guardadas em Parquet, em uma pasta nomeada pelo hash do conteúdo
+    do arquivo; execuções seguintes sobre o mesmo arquivo leem o Parquet e pulam o Excel.
+    Por padrão o cache fica em '.cache_excel', ao lado do arquivo.
+    """
     print(f"Carregando dados do arquivo: {caminho_arquivo}...")
     try:
-        df_base = pd.read_excel(caminho_arquivo, sheet_name='Base')
-        df_skus = pd.read_excel(caminho_arquivo, sheet_name='SKUS')
+        pasta_cache = None
+        if usar_cache:
+            diretorio_cache = diretorio_cache or os.path.join(os.path.dirname(os.path.abspath(caminho_arquivo)), '.cache_excel')
+            chave = f"{_hash_arquivo(caminho_arquivo)}-v{VERSAO_CACHE_EXCEL}"
+            pasta_cache = os.path.join(diretorio_cache, chave)
+            caminho_base = os.path.join(pasta_cache, 'base.parquet')
+            caminho_skus = os.path.join(pasta_cache, 'skus.parquet')
+            if os.path.exists(caminho_base) and os.path.exists(caminho_skus):
+                df_base = _do_cache(pd.read_parquet(caminho_base))
+                df_skus = _do_cache(pd.read_parquet(caminho_skus))
+                print("-> Dados carregados do cache (arquivo sem alterações).")
+                return df_base, df_skus
+
+        df_base, df_skus = _ler_abas_excel(caminho_arquivo)
+
+        if pasta_cache is not None:
+            try:
+                os.makedirs(pasta_cache, exist_ok=True)
+                for df, caminho in ((df_base, caminho_base), (df_skus, caminho_skus)):
+                    # Temporário por processo: arquivos iguais podem ser lidos em paralelo no lote
+                    temporario = f"{caminho}.{os.getpid()}.tmp"
+                    _para_cache(df).to_parquet(temporario, index=False)
+                    os.replace(temporario, caminho)
+            except Exception as e:
+                # Falha no cache não impede o processamento
+                print(f"  - Aviso: não foi possível gravar o cache ({e}).")
+
         print("-> Dados carregados com sucesso.")
         return df_base, df_skus
     except Exception as e:
         print(f"ERRO ao carregar o arquivo: {e}")
         return None, None
 
-def limpar_e_unificar_dados(df_base, df_skus):
+# Versão das regras de fuzzy matching (scorer, limiares e normalização dos nomes); deve
+# mudar sempre que elas mudarem, para invalidar as correções guardadas em disco
+VERSAO_REGRAS_FUZZY = '1'
+
+def limiar_fuzzy(nome_norm):
+    """Retorna o score mínimo aceito para um nome; é mais rigoroso com nomes curtos."""
+    return 75 if len(nome_norm) <= 4 else 80
+
+def _ngramas(texto, n):
+    """Retorna o conjunto de n-gramas de caracteres de um texto."""
+    return {texto[i:i + n] for i in range(len(texto) - n + 1)}
+
+def _tamanho_ngrama(nome):
     """
-    Orquestra todo o pipeline de limpeza e transformação dos dados.
-    
-    Recebe os DataFrames brutos e retorna três itens: o DataFrame limpo, 
-    um DataFrame com os dados rejeitados para auditoria, e a contagem de
-    linhas que eram válidas antes da etapa final de validação.
+    Escolhe o n-grama usado no bloqueio de um nome sujo.
+
+    Com trigramas a partir de 6 caracteres e bigramas a partir de 4, um único erro de
+    digitação sempre deixa algum n-grama em comum com o nome correto. Nomes mais
+    distantes, ainda aceitos pelo WRatio, podem não ter nenhum. Nomes menores
+    (retorna None) são comparados com o catálogo inteiro.
     """
-    print("\nIniciando o pipeline de limpeza e transformação...")
-    
-    # Ponto de partida: armazena a contagem de linhas do arquivo bruto
-    contagem_inicial_bruta = len(df_base)
-    
-    lista_rejeitados = []
+    if len(nome) >= 6:
+        return 3
+    if len(nome) >= 4:
+        return 2
+    return None
+
+def construir_indice_ngramas(nomes):
+    """
+    Constroi índices invertidos (bigramas e trigramas) -> posições dos nomes que os contêm.
+
+    Serve de bloqueio para o fuzzy matching: cada nome sujo só é comparado com os
+    nomes do catálogo que compartilham pelo menos um n-grama com ele.
+    """
+    indice = {2: {}, 3: {}}
+    for n, postagens in indice.items():
+        for posicao, nome in enumerate(nomes):
+            for grama in _ngramas(nome, n):
+                postagens.setdefault(grama, []).append(posicao)
+    return {n: {g: np.array(p, dtype=np.int64) for g, p in postagens.items()} for n, postagens in indice.items()}
+
+def _melhores_por_cdist(nomes_sujos, nomes_corretos, tamanho_lote):
+    """
+    Compara lotes de nomes sujos com o catálogo inteiro; retorna (posição do melhor, score) de cada um.
+
+    O lote é reduzido para que a matriz lote x catálogo caiba em `MAX_BYTES_MATRIZ_CDIST`
+    (cerca de 80 nomes por lote com 100 mil nomes no catálogo).
+    """
+    tamanho_lote = max(1, min(tamanho_lote, MAX_BYTES_MATRIZ_CDIST // (8 * len(nomes_corretos))))
+    posicoes, scores = [], []
+    for inicio in range(0, len(nomes_sujos), tamanho_lote):
+        lote = nomes_sujos[inicio:inicio + tamanho_lote]
+        matriz = process.cdist(lote, nomes_corretos, scorer=fuzz.WRatio, dtype=np.float64, workers=-1)
+        # argmax devolve o primeiro maior score, o mesmo desempate do extractOne
+        melhores = matriz.argmax(axis=1)
+        posicoes.append(melhores)
+        scores.append(matriz[np.arange(len(lote)), melhores])
+    return np.concatenate(posicoes), np.concatenate(scores)
+
+def _melhores_por_bloqueio(nomes_sujos, nomes_corretos, indice, tamanho_lote):
+    """
+    Compara cada nome sujo apenas com os candidatos do índice de n-gramas.
+
+    Os pares (sujo, candidato) de um lote são pontuados de uma vez com `process.cpdist`;
+    nomes sem nenhum candidato recebem score 0.
+    """
+    posicoes = np.zeros(len(nomes_sujos), dtype=np.int64)
+    scores = np.zeros(len(nomes_sujos))
+    for inicio in range(0, len(nomes_sujos), tamanho_lote):
+        lote = nomes_sujos[inicio:inicio + tamanho_lote]
+        ids_sujo, ids_candidato = [], []
+        for deslocamento, nome in enumerate(lote):
+            n = _tamanho_ngrama(nome)
+            postagens = [indice[n][g] for g in _ngramas(nome, n) if g in indice[n]]
+            if postagens:
+                # np.unique ordena os candidatos na ordem do catálogo, preservando o desempate
+                candidatos = np.unique(np.concatenate(postagens))
+                ids_sujo.append(np.full(len(candidatos), inicio + deslocamento))
+                ids_candidato.append(candidatos)
+        if not ids_sujo:
+            continue
+
+        ids_sujo = np.concatenate(ids_sujo)
+        ids_candidato = np.concatenate(ids_candidato)
+        scores_pares = process.cpdist(
+            [nomes_sujos[i] for i in ids_sujo], [nomes_corretos[i] for i in ids_candidato],
+            scorer=fuzz.WRatio, dtype=np.float64, workers=-1
+        )
+
+        # Maior score de cada nome sujo e, entre os empates, o primeiro candidato
+        inicios_grupo = np.flatnonzero(np.r_[True, ids_sujo[1:] != ids_sujo[:-1]])
+        maximos = np.maximum.reduceat(scores_pares, inicios_grupo)
+        eh_maximo = scores_pares == np.repeat(maximos, np.diff(np.r_[inicios_grupo, len(ids_sujo)]))
+        ids_max, primeira_ocorrencia = np.unique(ids_sujo[eh_maximo], return_index=True)
+        posicoes[ids_max] = ids_candidato[eh_maximo][primeira_ocorrencia]
+        scores[ids_max] = scores_pares[eh_maximo][primeira_ocorrencia]
+    return posicoes, scores
+
+@etapa(linhas_saida=len)
+def mapear_nomes_fuzzy(nomes_sujos, nomes_corretos, tamanho_lote=512, limite_bloqueio=None, indice=None):
+    """
+    Associa cada nome sujo ao nome correto mais parecido (fuzz.WRatio) em lotes.
+
+    Os nomes sujos são pontuados contra o catálogo em lote com `process.cdist`, usando
+    todos os núcleos; `tamanho_lote` é o máximo de nomes por lote, reduzido em catálogos
+    grandes para limitar a memória da matriz de scores. O melhor candidato é o primeiro de maior score, como em
+    `process.extractOne`, e só é aceito se atingir `limiar_fuzzy`.
+
+    Por padrão a comparação é completa e o resultado é idêntico ao `extractOne`. Com
+    `limite_bloqueio`, catálogos maiores que ele usam um índice de n-gramas para
+    comparar cada nome apenas com os nomes que compartilham algum n-grama com ele
+    (pares pontuados com `process.cpdist`). O bloqueio é uma aproximação: quando o
+    melhor nome não compartilha nenhum n-grama, o nome sujo fica sem correção ou recebe
+    outro candidato. A concordância com a busca completa é medida nos benchmarks.
+
+    Returns:
+        dict: Mapeamento nome sujo -> nome correto, apenas para os nomes aceitos.
+    """
+    nomes_sujos = list(nomes_sujos)
+    nomes_corretos = list(nomes_corretos)
+    if not nomes_sujos or not nomes_corretos:
+        return {}
+
+    posicoes = np.zeros(len(nomes_sujos), dtype=np.int64)
+    scores = np.zeros(len(nomes_sujos))
+    if limite_bloqueio is not None and len(nomes_corretos) > limite_bloqueio:
+        indice = indice if indice is not None else construir_indice_ngramas(nomes_corretos)
+        curtos = np.array([_tamanho_ngrama(nome) is None for nome in nomes_sujos])
+    else:
+        curtos = np.ones(len(nomes_sujos), dtype=bool)
+
+    # Nomes curtos (ou catálogo pequeno): comparação completa
+    ids_curtos = np.flatnonzero(curtos)
+    if len(ids_curtos):
+        posicoes[ids_curtos], scores[ids_curtos] = _melhores_por_cdist(
+            [nomes_sujos[i] for i in ids_curtos], nomes_corretos, tamanho_lote
+        )
+    # Demais nomes: comparação restrita aos candidatos do índice
+    ids_longos = np.flatnonzero(~curtos)
+    if len(ids_longos):
+        posicoes[ids_longos], scores[ids_longos] = _melhores_por_bloqueio(
+            [nomes_sujos[i] for i in ids_longos], nomes_corretos, indice, tamanho_lote
+        )
+
+    return {
+        nome_sujo: nomes_corretos[posicao]
+        for nome_sujo, posicao, score in zip(nomes_sujos, posicoes, scores)
+        if score >= limiar_fuzzy(nome_sujo)
+    }
+
+MAPA_MESES = {'JANEIRO': 1, 'FEVEREIRO': 2, 'MARÇO': 3, 'ABRIL': 4, 'MAIO': 5, 'JUNHO': 6, 'JULHO': 7, 'AGOSTO': 8, 'SETEMBRO': 9, 'OUTUBRO': 10, 'NOVEMBRO': 11, 'DEZEMBRO': 12, 'JAN': 1, 'FEV': 2, 'MAR': 3, 'ABR': 4, 'MAI': 5, 'JUN': 6, 'JUL': 7, 'AGO': 8, 'SET': 9, 'OUT': 10, 'NOV': 11, 'DEZ': 12}
+
+def corrigir_data_linha(linha):
+    """
+    Define a hierarquia de regras para extrair um ano e mês válidos de uma linha.
+
+    Versão linha a linha, mantida como referência para `corrigir_datas`.
+    """
+    # Prioridade 1: Tenta usar a coluna 'Data' se for um formato reconhecivel
+    data_dt = pd.to_datetime(linha['Data'], errors='coerce', dayfirst=True)
+    if pd.notna(data_dt):
+        return data_dt.year, data_dt.month
+
+    # Prioridade 2: Se a coluna 'Data' falhar, usa as colunas 'Ano' e 'Mês'
+    ano_str = str(linha['Ano']).replace('.0', '')
+    mes_str = str(linha['Mês']).replace('.0', '')
     
+    # Sub-regras de correção para o ano
+    if ano_str == 'YY':
+        ano_final = 2022
+    elif ano_str == '9999':
+        ano_final = None # Inválido se a coluna 'Data' também não ajudou
+    else:
+        ano_final = pd.to_numeric(ano_str, errors='coerce')
+
+    if pd.notna(ano_final) and ano_final < 100:
+        ano_final += 2000
+
+    # Sub-regras de correção para o mês
+    mes_final = pd.to_numeric(mes_str, errors='coerce')
+    if pd.isna(mes_final):
+        mes_final = MAPA_MESES.get(mes_str.upper(), None)
+        
+    return ano_final, mes_final
+
+def _por_valor_distinto(serie, funcao):
+    """
+    Aplica `funcao` aos valores distintos de uma coluna e devolve o resultado alinhado às linhas.
+
+    `funcao` recebe uma Series com os valores distintos e retorna uma Series de mesmo
+    tamanho; valores ausentes entram como NaN.
+    """
+    codigos, unicos = pd.factorize(serie)
+    valores = pd.Series(list(unicos) + [np.nan], dtype=object)
+    # O código -1 (ausente) aponta para o NaN acrescentado ao final
+    resultado = funcao(valores).to_numpy(dtype='float64')
+    return pd.Series(resultado[codigos], index=serie.index)
+
+def _texto_sem_decimal(valores):
+    """Reproduz `str(valor).replace('.0', '')` da versão linha a linha."""
+    return valores.map(str).str.replace('.0', '', regex=False)
+
+def _ano_e_mes_da_data(valores):
+    # A conversão escalar (dateutil) é a mesma da versão linha a linha, mas roda uma vez por valor distinto
+    datas = [pd.to_datetime(v, errors='coerce', dayfirst=True) for v in valores]
+    return pd.DataFrame({
+        'ano': [d.year if pd.notna(d) else np.nan for d in datas],
+        'mes': [d.month if pd.notna(d) else np.nan for d in datas],
+    })
+
+def _ano_das_colunas(valores):
+    texto = _texto_sem_decimal(valores)
+    ano = pd.to_numeric(texto, errors='coerce').astype('float64')
+    ano = ano.mask(texto == 'YY', 2022).mask(texto == '9999', np.nan)
+    return ano.mask(ano < 100, ano + 2000)
+
+def _mes_das_colunas(valores):
+    texto = _texto_sem_decimal(valores)
+    mes = pd.to_numeric(texto, errors='coerce').astype('float64')
+    return mes.fillna(texto.str.upper().map(MAPA_MESES).astype('float64'))
+
+@etapa
+def corrigir_datas(df):
+    """
+    Versão vetorizada de `corrigir_data_linha`, aplicada às colunas inteiras.
+
+    Segue as mesmas prioridades (coluna 'Data'; depois 'Ano' e 'Mês' com as regras de
+    'YY', '9999', ano com dois dígitos e nomes de meses). Cada regra é avaliada uma
+    única vez por valor distinto da coluna e o resultado é propagado às linhas.
+
+    Returns:
+        tuple: (ano, mes) como Series float64 alinhadas a `df`, com NaN onde não há valor válido.
+    """
+    codigos_data, datas_unicas = pd.factorize(df['Data'])
+    partes_data = _ano_e_mes_da_data(list(datas_unicas) + [np.nan])
+    ano_data = pd.Series(partes_data['ano'].to_numpy(dtype='float64')[codigos_data], index=df.index)
+    mes_data = pd.Series(partes_data['mes'].to_numpy(dtype='float64')[codigos_data], index=df.index)
+
+    # A coluna 'Data' tem prioridade; 'Ano' e 'Mês' só valem quando ela não é reconhecida
+    data_valida = ano_data.notna()
+    ano = ano_data.where(data_valida, _por_valor_distinto(df['Ano'], _ano_das_colunas))
+    mes = mes_data.where(data_valida, _por_valor_distinto(df['Mês'], _mes_das_colunas))
+    return ano, mes
+
+# Motivos de rejeição, na ordem de precedência em que são avaliados
+MOTIVOS_REJEICAO = [
+    'SKU não mapeado',
+    'Mês ou Ano inválido',
+    'Ano fora do intervalo (1990-2030)',
+    'Mês fora do intervalo (1-12)',
+]
+
+@etapa
+def classificar_rejeicoes(nome_produto, ano_final, mes_final):
+    """
+    Atribui a cada linha o primeiro motivo de rejeição aplicável, ou NaN se a linha é válida.
+
+    As regras de intervalo usam o ano e o mês truncados para inteiro, como na
+    validação original.
+
+    Returns:
+        pd.Series: Coluna categórica com as categorias de MOTIVOS_REJEICAO.
+    """
+    data_invalida = (ano_final.isna() | mes_final.isna()).to_numpy()
+    ano_inteiro = np.trunc(ano_final.to_numpy())
+    mes_inteiro = np.trunc(mes_final.to_numpy())
+    with np.errstate(invalid='ignore'):
+        ano_fora = ~((ano_inteiro >= 1990) & (ano_inteiro <= 2030))
+        mes_fora = ~((mes_inteiro >= 1) & (mes_inteiro <= 12))
+
+    # np.select respeita a ordem das condições, reproduzindo a precedência das etapas
+    codigos = np.select(
+        [nome_produto.isna().to_numpy(), data_invalida, ano_fora, mes_fora], [0, 1, 2, 3], default=-1
+    )
+    return pd.Series(
+        pd.Categorical.from_codes(codigos, categories=MOTIVOS_REJEICAO), index=nome_produto.index
+    )
+
+def organizar_rejeitados(rejeitados):
+    """
+    Agrupa as linhas rejeitadas por motivo e aplica o formato de colunas da auditoria.
+
+    A ordenação é estável, mantendo a ordem original das linhas dentro de cada motivo. O
+    formato reproduz o de quando cada etapa guardava sua fatia: as rejeições de SKU não
+    têm 'Ano_Final'/'Mes_Final' (a data ainda não era tratada) e, se só há rejeições de
+    intervalo, essas colunas são inteiras. Serve também para juntar rejeitados de
+    execuções diferentes (veja `limpar_incremental`).
+    """
+    codigos = rejeitados['Motivo_Remocao'].cat.codes.to_numpy()
+    if (np.diff(codigos) < 0).any():
+        ordem = np.argsort(codigos, kind='stable')
+        rejeitados, codigos = rejeitados.iloc[ordem], codigos[ordem]
+    colunas_base = [col for col in rejeitados.columns if col not in ('Motivo_Remocao', 'Ano_Final', 'Mes_Final')]
+
+    if (codigos == 0).all():
+        return rejeitados[colunas_base + ['Motivo_Remocao']]
+
+    rejeitados = rejeitados.copy()
+    for nome in ('Ano_Final', 'Mes_Final'):
+        valores = rejeitados[nome].to_numpy(dtype='float64') if nome in rejeitados.columns else np.full(len(rejeitados), np.nan)
+        # Só rejeições de intervalo: a coluna era inteira em todas as fatias
+        rejeitados[nome] = valores.astype(int) if (codigos >= 2).all() else valores
+
+    if (codigos == 0).any():
+        ordem_colunas = colunas_base + ['Motivo_Remocao', 'Ano_Final', 'Mes_Final']
+    else:
+        ordem_colunas = colunas_base + ['Ano_Final', 'Mes_Final', 'Motivo_Remocao']
+    return rejeitados[ordem_colunas]
+
+@etapa
+def montar_rejeitados(df, ano_final, mes_final, mascara_limpa):
+    """
+    Monta o DataFrame de auditoria com as linhas rejeitadas, agrupadas por motivo.
+
+    As linhas mantêm seus rótulos de índice originais. As rejeições de data inválida
+    trazem 'Ano_Final'/'Mes_Final' brutos e as de intervalo, truncados para inteiro;
+    o formato final é o de `organizar_rejeitados`.
+    """
+    posicoes = np.flatnonzero(~mascara_limpa)
+    if len(posicoes) == 0:
+        return pd.DataFrame()
+
+    codigos = df['Motivo_Remocao'].cat.codes.to_numpy()[posicoes]
+    # Ordena as posições antes da cópia, para que `organizar_rejeitados` não precise reordenar
+    ordem = np.argsort(codigos, kind='stable')
+    posicoes, codigos = posicoes[ordem], codigos[ordem]
+
+    rejeitados = df.iloc[posicoes].copy()
+    if not (codigos == 0).all():
+        for nome, valores in (('Ano_Final', ano_final), ('Mes_Final', mes_final)):
+            valores = valores.to_numpy()[posicoes]
+            valores = np.where(codigos >= 2, np.trunc(valores), valores)
+            rejeitados[nome] = np.where(codigos == 0, np.nan, valores)
+    return organizar_rejeitados(rejeitados)
+
+class CatalogoSKU:
+    """
+    Catálogo de produtos normalizado, preparado uma única vez a partir da aba 'SKUS'.
+
+    Guarda os dicionários nome normalizado -> nome final e -> SKU, a lista de nomes
+    usada no fuzzy matching e, com `limite_bloqueio`, o índice de n-gramas dos
+    catálogos maiores que ele (veja `mapear_nomes_fuzzy`).
+    """
+
+    def __init__(self, df_skus, limite_bloqueio=None):
+        self.hash = _hash_tabela(df_skus[COLUNAS_SKUS])
+
+        # PADRONIZAÇÃO: Prepara os nomes do catálogo para comparação, em maiúsculas e sem espaços nas pontas
+        df_skus.dropna(subset=['Nome', 'SKU'], inplace=True)
+        df_skus['nome_norm'] = df_skus['Nome'].astype(str).str.upper().str.strip()
+
+        # Garante uma fonte da verdade única para os produtos, evitando duplicação no join
+        df_skus.drop_duplicates(subset=['nome_norm'], keep='first', inplace=True)
+
+        # Dicionários de mapeamento para uma busca rápida e segura
+        self.nome_por_norm = pd.Series(df_skus.Nome.values, index=df_skus.nome_norm).to_dict()
+        self.sku_por_norm = pd.Series(df_skus.SKU.values, index=df_skus.nome_norm).to_dict()
+        # Tipo do SKU decidido uma vez pelo catálogo inteiro, para ser o mesmo em todos os blocos
+        sku = pd.to_numeric(df_skus['SKU'], errors='coerce')
+        self.sku_inteiro = bool(sku.notna().all() and (sku % 1 == 0).all())
+        self.nomes_norm = list(self.nome_por_norm.keys())
+        self.limite_bloqueio = limite_bloqueio
+        usar_bloqueio = limite_bloqueio is not None and len(self.nomes_norm) > limite_bloqueio
+        self.indice = construir_indice_ngramas(self.nomes_norm) if usar_bloqueio else None
+
+    @property
+    def chave_correcoes(self):
+        """Identifica as decisões de fuzzy matching: mesmo catálogo, mesmas regras e mesmo modo de busca."""
+        modo = 'bloqueio' if self.indice is not None else 'completo'
+        return hashlib.sha256(f"{self.hash}|{VERSAO_REGRAS_FUZZY}|{modo}".encode()).hexdigest()[:16]
+
+    def corrigir_nomes(self, nomes_sujos, mapa_correcoes):
+        """
+        Completa `mapa_correcoes` com a decisão de fuzzy matching de cada nome ainda não visto.
+
+        Nomes sem correspondência aceita são registrados como None, para não serem
+        comparados de novo.
+        """
+        novos = [nome for nome in nomes_sujos if nome not in mapa_correcoes]
+        if novos:
+            aceitos = mapear_nomes_fuzzy(novos, self.nomes_norm, limite_bloqueio=self.limite_bloqueio, indice=self.indice)
+            mapa_correcoes.update({nome: aceitos.get(nome) for nome in novos})
+        return mapa_correcoes
+
+class ArmazemCorrecoes:
+    """
+    Correções de nomes persistidas em disco: nome sujo -> nome normalizado do catálogo, ou None.
+
+    O arquivo JSON é identificado pela `chave_correcoes` do catálogo; com outro catálogo ou
+    outras regras de fuzzy matching, começa-se um mapa novo. Nomes sem correspondência
+    também são guardados, para nunca serem comparados de novo.
+    """
+
+    def __init__(self, diretorio, chave_correcoes):
+        self.caminho_arquivo = os.path.join(diretorio, f'correcoes-{chave_correcoes}.json')
+        self.mapa = {}
+        if os.path.exists(self.caminho_arquivo):
+            try:
+                with open(self.caminho_arquivo, encoding='utf-8') as arquivo:
+                    self.mapa = json.load(arquivo)
+            except (OSError, ValueError) as e:
+                print(f"  - Aviso: correções guardadas ignoradas ({e}).")
+        self._tamanho_salvo = len(self.mapa)
+
+    def salvar(self):
+        """Grava o mapa em disco, se houver decisões novas."""
+        if len(self.mapa) == self._tamanho_salvo:
+            return
+        os.makedirs(os.path.dirname(self.caminho_arquivo) or '.', exist_ok=True)
+        temporario = f"{self.caminho_arquivo}.{os.getpid()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(self.mapa, arquivo, ensure_ascii=False)
+        os.replace(temporario, self.caminho_arquivo)
+        self._tamanho_salvo = len(self.mapa)
+
+@etapa
+def limpar_bloco(df_base, catalogo, mapa_correcoes=None):
+    """
+    Aplica a limpeza completa a um conjunto de linhas da aba 'Base', com um catálogo já preparado.
+
+    `mapa_correcoes` (nome sujo -> nome normalizado do catálogo, ou None) é reaproveitado
+    e atualizado, de modo que blocos seguintes só comparem nomes inéditos.
+
+    Returns:
+        tuple: (df_limpo, df_rejeitados, contagem de linhas válidas após a limpeza inicial).
+    """
+    mapa_correcoes = {} if mapa_correcoes is None else mapa_correcoes
+
     # 1. LIMPEZA INICIAL: Remove linhas que não contêm um objeto de venda válido e celulas com apenas espaços são primeiramente convertidas para NaN
     df_base['Objeto'] = df_base['Objeto'].astype(str).replace(r'^\s*$', np.nan, regex=True)
     df_base.dropna(subset=['Objeto'], inplace=True)
@@ -40,154 +602,257 @@ def limpar_e_unificar_dados(df_base, df_skus):
 
     # 2. PADRONIZAÇÃO: Prepara as colunas de texto para comparação, converte para maiúsculas e remove espaços para garantir consistência
     df_base['objeto_norm'] = df_base['Objeto'].astype(str).str.upper().str.strip()
-    df_skus.dropna(subset=['Nome', 'SKU'], inplace=True)
-    df_skus['nome_norm'] = df_skus['Nome'].astype(str).str.upper().str.strip()
 
-    # Garante uma fonte da verdade única para os produtos, evitando duplicação no join
-    df_skus.drop_duplicates(subset=['nome_norm'], keep='first', inplace=True)
-
-    # 3. ENRIQUECIMENTO SEGURO: Associa os dados de SKU aos produtos da base e cria dicionários de mapeamento para uma busca rápida e segura
-    mapa_norm_para_nome_final = pd.Series(df_skus.Nome.values, index=df_skus.nome_norm).to_dict()
-    mapa_norm_para_sku = pd.Series(df_skus.SKU.values, index=df_skus.nome_norm).to_dict()
-    
-    # Constroi um dicionário de correção para os nomes de produtos com erros
-    mapa_sujo_para_limpo_norm = {}
-    nomes_corretos_norm = list(mapa_norm_para_nome_final.keys())
-
-    for nome_sujo_norm in df_base['objeto_norm'].unique():
-        resultado = process.extractOne(nome_sujo_norm, nomes_corretos_norm, scorer=fuzz.WRatio)
-        if resultado:
-            melhor_match, score, _ = resultado
-            # O threshold é dinâmico para ser mais rigoroso com nomes curtos
-            threshold = 75 if len(nome_sujo_norm) <= 4 else 80
-            if score >= threshold:
-                mapa_sujo_para_limpo_norm[nome_sujo_norm] = melhor_match
+    # 3. ENRIQUECIMENTO SEGURO: Corrige os nomes de produtos com erros, comparando em lote apenas os nomes inéditos
+    catalogo.corrigir_nomes(df_base['objeto_norm'].unique(), mapa_correcoes)
 
     # Usa o dicionário de correção via .map() para adicionar NomeProduto e SKU.(essa abordagem é mais segura que um 'merge', pois não cria linhas duplicadas)
 
-    df_base['chave_norm_limpa'] = df_base['objeto_norm'].map(mapa_sujo_para_limpo_norm)
-    df_base['NomeProduto'] = df_base['chave_norm_limpa'].map(mapa_norm_para_nome_final)
-    df_base['SKU'] = df_base['chave_norm_limpa'].map(mapa_norm_para_sku)
-    
-    # Registra e remove produtos que não puderam ser mapeados com confiança.
-    rejeitados2 = df_base[df_base['NomeProduto'].isna()].copy()
-    if not rejeitados2.empty:
-        rejeitados2['Motivo_Remocao'] = 'SKU não mapeado'
-        lista_rejeitados.append(rejeitados2)
-    df_base.dropna(subset=['NomeProduto'], inplace=True)
-    
-    df = df_base.copy()
-
-    # 4. TRATAMENTO DE DATAS: Aplica uma função de correção robusta linha a linha
-    def corrigir_data_linha(linha):
-        """Define a hierarquia de regras para extrair um ano e mês válidos de uma linha."""
-        # Prioridade 1: Tenta usar a coluna 'Data' se for um formato reconhecivel
-        data_dt = pd.to_datetime(linha['Data'], errors='coerce', dayfirst=True)
-        if pd.notna(data_dt):
-            return data_dt.year, data_dt.month
-
-        # Prioridade 2: Se a coluna 'Data' falhar, usa as colunas 'Ano' e 'Mês'
-        ano_str = str(linha['Ano']).replace('.0', '')
-        mes_str = str(linha['Mês']).replace('.0', '')
-        
-        # Sub-regras de correção para o ano
-        if ano_str == 'YY':
-            ano_final = 2022
-        elif ano_str == '9999':
-            ano_final = None # Inválido se a coluna 'Data' também não ajudou
-        else:
-            ano_final = pd.to_numeric(ano_str, errors='coerce')
-
-        if pd.notna(ano_final) and ano_final < 100:
-            ano_final += 2000
-
-        # Sub-regras de correção para o mês
-        mapa_meses = {'JANEIRO': 1, 'FEVEREIRO': 2, 'MARÇO': 3, 'ABRIL': 4, 'MAIO': 5, 'JUNHO': 6, 'JULHO': 7, 'AGOSTO': 8, 'SETEMBRO': 9, 'OUTUBRO': 10, 'NOVEMBRO': 11, 'DEZEMBRO': 12, 'JAN': 1, 'FEV': 2, 'MAR': 3, 'ABR': 4, 'MAI': 5, 'JUN': 6, 'JUL': 7, 'AGO': 8, 'SET': 9, 'OUT': 10, 'NOV': 11, 'DEZ': 12}
-        mes_final = pd.to_numeric(mes_str, errors='coerce')
-        if pd.isna(mes_final):
-            mes_final = mapa_meses.get(mes_str.upper(), None)
-            
-        return ano_final, mes_final
-    
-    # Aplica a função de correção para criar as colunas de data finais
-    resultados_data = df.apply(corrigir_data_linha, axis=1, result_type='expand')
-    df['Ano_Final'] = resultados_data[0]
-    df['Mes_Final'] = resultados_data[1]
-    
-    # 5. VALIDAÇÃO FINAL: Descarta registros que, mesmo após as correções, permanecem invalidos
-    df['Ano_Final'] = pd.to_numeric(df['Ano_Final'], errors='coerce')
-    df['Mes_Final'] = pd.to_numeric(df['Mes_Final'], errors='coerce')
-
-    rejeitados_data_invalida = df[df['Ano_Final'].isna() | df['Mes_Final'].isna()].copy()
-    if not rejeitados_data_invalida.empty:
-        rejeitados_data_invalida['Motivo_Remocao'] = 'Mês ou Ano inválido'
-        lista_rejeitados.append(rejeitados_data_invalida)
-    df.dropna(subset=['Ano_Final', 'Mes_Final'], inplace=True)
+    df_base['chave_norm_limpa'] = df_base['objeto_norm'].map(mapa_correcoes)
+    df_base['NomeProduto'] = df_base['chave_norm_limpa'].map(catalogo.nome_por_norm)
+    df_base['SKU'] = df_base['chave_norm_limpa'].map(catalogo.sku_por_norm)
     
-    df['Ano_Final'] = df['Ano_Final'].astype(int)
-    df['Mes_Final'] = df['Mes_Final'].astype(int)
-
-    # Valida o intervalo de negocio para o ano
-    mask_ano_invalido = ~df['Ano_Final'].between(1990, 2030)
-    rejeitados_ano_intervalo = df[mask_ano_invalido].copy()
-    if not rejeitados_ano_intervalo.empty:
-        rejeitados_ano_intervalo['Motivo_Remocao'] = 'Ano fora do intervalo (1990-2030)'
-        lista_rejeitados.append(rejeitados_ano_intervalo)
-    df = df[~mask_ano_invalido]
-
-    # Valida o intervalo para o mês
-    mask_mes_invalido = ~df['Mes_Final'].between(1, 12)
-    rejeitados_mes_intervalo = df[mask_mes_invalido].copy()
-    if not rejeitados_mes_intervalo.empty:
-        rejeitados_mes_intervalo['Motivo_Remocao'] = 'Mês fora do intervalo (1-12)'
-        lista_rejeitados.append(rejeitados_mes_intervalo)
-    df = df[~mask_mes_invalido]
-
-    df_rejeitados = pd.concat(lista_rejeitados, ignore_index=True) if lista_rejeitados else pd.DataFrame()
-
-    # 6. FINALIZAÇÃO: Prepara o DataFrame para a saída
+    # 4. TRATAMENTO DE DATAS: Aplica a hierarquia de correção sobre as colunas inteiras
+    ano_final, mes_final = corrigir_datas(df_base)
+
+    # 5. VALIDAÇÃO: Atribui a cada linha o primeiro motivo de rejeição que se aplica, em uma única passada
+    df_base['Motivo_Remocao'] = classificar_rejeicoes(df_base['NomeProduto'], ano_final, mes_final)
+    mascara_limpa = df_base['Motivo_Remocao'].isna().to_numpy()
+
+    df_rejeitados = montar_rejeitados(df_base, ano_final, mes_final, mascara_limpa)
+
+    # 6. FINALIZAÇÃO: Separa as linhas válidas uma única vez, levando só as colunas de saída
     colunas_numericas = ['Investido', 'Cliques', 'Receita', 'Conversões']
+    colunas_saida = [col for col in ['SKU', 'NomeProduto'] + colunas_numericas if col in df_base.columns]
+    df = df_base.loc[mascara_limpa, colunas_saida]
     for col in colunas_numericas:
         df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+    df['Ano_Final'] = ano_final[mascara_limpa].astype(int)
+    df['Mes_Final'] = mes_final[mascara_limpa].astype(int)
 
     # Constroi o DataFrame limpo de forma explícita para evitar colunas indesejadas
-    df['Data_Final'] = pd.to_datetime(df['Ano_Final'].astype(str) + '-' + df['Mes_Final'].astype(str) + '-01', format='%Y-%m-%d')
+    df['Data_Final'] = pd.to_datetime(pd.DataFrame({'year': df['Ano_Final'], 'month': df['Mes_Final'], 'day': 1}))
     mapa_colunas_finais = {'Data_Final': 'Data','Mes_Final': 'Mes','Ano_Final': 'Ano','SKU': 'SKU','NomeProduto': 'NomeProduto','Investido': 'Investido','Cliques': 'Cliques','Receita': 'Receita','Conversões': 'Conversões'}
     colunas_de_origem = [col for col in mapa_colunas_finais.keys() if col in df.columns]
     df_limpo = df[colunas_de_origem]
     df_limpo = df_limpo.rename(columns=mapa_colunas_finais)
 
+    return df_limpo, df_rejeitados, contagem_apos_limpeza_inicial
+
+@etapa
+def limpar_e_unificar_dados(df_base, df_skus):
+    """
+    Orquestra todo o pipeline de limpeza e transformação dos dados.
+    
+    Recebe os DataFrames brutos e retorna três itens: o DataFrame limpo, 
+    um DataFrame com os dados rejeitados para auditoria, e a contagem de
+    linhas que eram válidas antes da etapa final de validação.
+    """
+    print("\nIniciando o pipeline de limpeza e transformação...")
+    catalogo = CatalogoSKU(df_skus)
+    df_limpo, df_rejeitados, contagem_apos_limpeza_inicial = limpar_bloco(df_base, catalogo)
+
     print("\nLimpeza de dados concluída!")
     return df_limpo, df_rejeitados, contagem_apos_limpeza_inicial
 
-def analisar_dados(df_limpo, df_rejeitados, contagem_inicial_valida):
-    """Apresenta os relatórios analíticos e os insights sobre a qualidade dos dados."""
+def _acrescentar(df_acumulado, df_novo):
+    """Junta as linhas novas às já processadas; um dos lados vazio é descartado, mantendo os tipos do outro."""
+    if df_acumulado is None or df_acumulado.empty:
+        return df_novo
+    if df_novo.empty:
+        return df_acumulado
+    return pd.concat([df_acumulado, df_novo])
+
+@etapa
+def limpar_incremental(caminho_arquivo, diretorio_estado='.estado_limpeza'):
+    """
+    Limpa uma planilha processando só as linhas da aba 'Base' acrescentadas desde a última execução.
+
+    Os resultados já limpos e rejeitados ficam em um único pickle no `diretorio_estado`,
+    com os mesmos tipos do processamento normal, junto do número de linhas processadas e
+    do hash delas; o arquivo é substituído de uma vez, então resultados e contagem nunca
+    ficam de execuções diferentes. Se essas linhas mudaram (a base não foi apenas
+    acrescida), se o catálogo/regras mudaram ou se o estado não puder ser lido, a
+    planilha é reprocessada inteira. As correções de nomes ficam em um
+    `ArmazemCorrecoes`, então apenas grafias inéditas passam pelo fuzzy matching.
+
+    Returns:
+        tuple: (df_limpo, df_rejeitados, contagem de linhas válidas após a limpeza inicial),
+        acumulados de todas as execuções; (None, None, 0) se a planilha não puder ser lida.
+    """
+    df_base, df_skus = carregar_dados_excel(caminho_arquivo)
+    if df_base is None or df_skus is None:
+        return None, None, 0
+
+    print("\nIniciando o pipeline de limpeza incremental...")
+    catalogo = CatalogoSKU(df_skus)
+    armazem = ArmazemCorrecoes(diretorio_estado, catalogo.chave_correcoes)
+
+    pasta = os.path.join(diretorio_estado, os.path.splitext(os.path.basename(caminho_arquivo))[0])
+    caminho_estado = os.path.join(pasta, 'estado.pkl')
+
+    estado = {}
+    if os.path.exists(caminho_estado):
+        try:
+            estado = pd.read_pickle(caminho_estado)
+        except Exception as e:
+            # Estado corrompido ou de outra versão do pandas: a planilha é reprocessada inteira
+            print(f"  - Aviso: estado anterior ignorado ({e}).")
+    ja_processadas = estado.get('linhas', 0)
+    reaproveitar = (
+        0 < ja_processadas <= len(df_base)
+        and estado.get('chave_correcoes') == catalogo.chave_correcoes
+        and estado.get('hash_linhas') == _hash_tabela(df_base.iloc[:ja_processadas])
+    )
+
+    if reaproveitar:
+        df_limpo = estado['limpos']
+        df_rejeitados = estado['rejeitados']
+        contagem_inicial = estado['contagem_inicial']
+    else:
+        ja_processadas = 0
+        df_limpo = df_rejeitados = None
+        contagem_inicial = 0
+    print(f"-> {ja_processadas} linhas já processadas, {len(df_base) - ja_processadas} novas.")
+
+    if ja_processadas < len(df_base):
+        novos_limpos, novos_rejeitados, contagem_nova = limpar_bloco(df_base.iloc[ja_processadas:].copy(), catalogo, armazem.mapa)
+        armazem.salvar()
+        # Os índices seguem a numeração das linhas da aba 'Base', como no processamento normal
+        df_limpo = _acrescentar(df_limpo, novos_limpos)
+        df_rejeitados = _acrescentar(df_rejeitados, novos_rejeitados)
+        if not df_rejeitados.empty:
+            # Agrupa por motivo as rejeições das execuções anteriores e as novas
+            df_rejeitados = organizar_rejeitados(df_rejeitados)
+        contagem_inicial += contagem_nova
+
+        os.makedirs(pasta, exist_ok=True)
+        temporario = f"{caminho_estado}.{os.getpid()}.tmp"
+        pd.to_pickle({
+            'linhas': len(df_base),
+            'hash_linhas': _hash_tabela(df_base),
+            'chave_correcoes': catalogo.chave_correcoes,
+            'contagem_inicial': contagem_inicial,
+            'limpos': df_limpo,
+            'rejeitados': df_rejeitados,
+        }, temporario)
+        os.replace(temporario, caminho_estado)
+
+    print("\nLimpeza de dados concluída!")
+    return df_limpo, df_rejeitados, contagem_inicial
+
+@etapa
+def construir_cubo_agregado(df_limpo):
+    """
+    Agrega os dados limpos em um cubo (Ano, Mes, SKU, NomeProduto) em uma única passada.
+
+    Além das somas de Receita, Cliques, Investido e Conversões, guarda a contagem de
+    registros e as medidas restritas aos registros ativos (receita e cliques > 0), para
+    que todos os relatórios possam ser respondidos a partir do cubo.
+    """
+    ativos = (df_limpo['Receita'] > 0) & (df_limpo['Cliques'] > 0)
+    chaves = [col for col in ['Ano', 'Mes', 'SKU', 'NomeProduto'] if col in df_limpo.columns]
+    cubo = (
+        df_limpo.assign(
+            Registros=1,
+            Cliques_Ativos=df_limpo['Cliques'].where(ativos, 0),
+            Registros_Ativos=ativos.astype(int),
+        )
+        .groupby(chaves, observed=True, sort=True)[
+            ['Receita', 'Cliques', 'Investido', 'Conversões', 'Registros', 'Cliques_Ativos', 'Registros_Ativos']
+        ]
+        .sum()
+        .reset_index()
+    )
+    return cubo
+
+def _ranking_por_grupo(df, grupo, coluna, n, maiores=True):
+    """
+    Retorna as `n` primeiras linhas de cada grupo ordenadas por `coluna`.
+
+    Equivale a aplicar `nlargest`/`nsmallest` em cada grupo: empates mantêm a ordem
+    original das linhas (a ordenação por várias colunas é estável).
+    """
+    ordenado = df.sort_values([grupo, coluna], ascending=[True, not maiores])
+    return ordenado.groupby(grupo, sort=False).head(n)
+
+@etapa
+def gerar_relatorios(cubo, n=5):
+    """
+    Calcula os relatórios de produtos a partir do cubo agregado.
+
+    Returns:
+        dict: DataFrames 'top_receita_mes', 'menos_cliques_mes' e 'receita_media',
+        além da lista de meses presentes nos dados ('meses').
+    """
+    por_mes = cubo.groupby(['Mes', 'NomeProduto'], observed=True, sort=True)[
+        ['Receita', 'Cliques_Ativos', 'Registros_Ativos']
+    ].sum().reset_index()
+
+    # Só entram no relatório de cliques os produtos com algum registro ativo no mês
+    ativos = por_mes[por_mes['Registros_Ativos'] > 0].rename(columns={'Cliques_Ativos': 'Cliques'})
+
+    por_produto = cubo.groupby('NomeProduto', observed=True, sort=True)[['Receita', 'Registros']].sum()
+    receita_media = (por_produto['Receita'] / por_produto['Registros']).rename('Receita').nlargest(n)
+
+    return {
+        'meses': sorted(cubo['Mes'].unique()),
+        'top_receita_mes': _ranking_por_grupo(por_mes, 'Mes', 'Receita', n)[['Mes', 'NomeProduto', 'Receita']],
+        'menos_cliques_mes': _ranking_por_grupo(ativos, 'Mes', 'Cliques', n, maiores=False)[['Mes', 'NomeProduto', 'Cliques']],
+        'receita_media': receita_media,
+    }
+
+def relatorios_para_json(relatorios):
+    """Serializa os relatórios de `gerar_relatorios` em JSON, para reuso em dashboards."""
+    return json.dumps({
+        'meses': [int(mes) for mes in relatorios['meses']],
+        'top_receita_mes': relatorios['top_receita_mes'].to_dict(orient='records'),
+        'menos_cliques_mes': relatorios['menos_cliques_mes'].to_dict(orient='records'),
+        'receita_media': relatorios['receita_media'].reset_index().to_dict(orient='records'),
+    }, ensure_ascii=False, default=float)
+
+@etapa
+def analisar_dados(df_limpo, df_rejeitados, contagem_inicial_valida, cubo=None, num_rejeitados=None):
+    """
+    Apresenta os relatórios analíticos e os insights sobre a qualidade dos dados.
+
+    Os relatórios saem de um cubo agregado, construído aqui se não for informado.
+    No modo em blocos os DataFrames completos não existem: basta passar o `cubo` e
+    `num_rejeitados`, com `df_limpo` e `df_rejeitados` como None.
+
+    Returns:
+        dict: Os relatórios de `gerar_relatorios`, acrescidos do próprio 'cubo' e das
+        contagens de 'qualidade'.
+    """
     print("\n--- RELATÓRIO DE ANÁLISE ---")
+    cubo = cubo if cubo is not None else construir_cubo_agregado(df_limpo)
+    relatorios = gerar_relatorios(cubo)
+    relatorios['cubo'] = cubo
+
+    top_por_mes = dict(tuple(relatorios['top_receita_mes'].groupby('Mes')))
+    menos_cliques_por_mes = dict(tuple(relatorios['menos_cliques_mes'].groupby('Mes')))
+    vazio_cliques = relatorios['menos_cliques_mes'].iloc[0:0]
     
     # Seção 1: Análise de performance de produtos
     print("\n1. Top 5 Produtos por Faturamento (Receita) Mensal:")
-    top_5_receita_mes = df_limpo.groupby(['Mes', 'NomeProduto'])['Receita'].sum().reset_index()
-    for mes in sorted(df_limpo['Mes'].unique()):
+    for mes in relatorios['meses']:
         print(f"\nMês {mes}:")
-        top_produtos = top_5_receita_mes[top_5_receita_mes['Mes'] == mes].nlargest(5, 'Receita')
+        top_produtos = top_por_mes[mes]
         print(top_produtos[['NomeProduto', 'Receita']].to_string(index=False, float_format='R$ {:,.2f}'.format))
 
     print("\n\n2. Top 5 Produtos com Menos Cliques (que tiveram receita e cliques > 0):")
-    df_ativos = df_limpo[(df_limpo['Receita'] > 0) & (df_limpo['Cliques'] > 0)]
-    bottom_5_cliques_mes = df_ativos.groupby(['Mes', 'NomeProduto'])['Cliques'].sum().reset_index()
-    for mes in sorted(df_limpo['Mes'].unique()):
+    for mes in relatorios['meses']:
         print(f"\nMês {mes}:")
-        bottom_produtos = bottom_5_cliques_mes[bottom_5_cliques_mes['Mes'] == mes].nsmallest(5, 'Cliques')
+        bottom_produtos = menos_cliques_por_mes.get(mes, vazio_cliques)
         print(bottom_produtos[['NomeProduto', 'Cliques']].to_string(index=False))
 
     print("\n\n3. Top 5 Produtos por Receita Média por Registro (Anual):")
-    receita_media = df_limpo.groupby('NomeProduto')['Receita'].mean().nlargest(5)
-    print(receita_media.to_string(float_format='R$ {:,.2f}'.format))
+    print(relatorios['receita_media'].to_string(float_format='R$ {:,.2f}'.format))
 
     # Seção 2: Análise sobre o processo de limpeza e qualidade dos dados
     print("\n\n4. Insights Estratégicos sobre a Qualidade dos Dados:")
-    num_rejeitados = len(df_rejeitados)
-    num_limpos = len(df_limpo)
+    num_rejeitados = len(df_rejeitados) if num_rejeitados is None else num_rejeitados
+    num_limpos = len(df_limpo) if df_limpo is not None else int(cubo['Registros'].sum())
     
     if contagem_inicial_valida > 0:
         perc_rejeitado = (num_rejeitados / contagem_inicial_valida) * 100
@@ -204,48 +869,554 @@ def analisar_dados(df_limpo, df_rejeitados, contagem_inicial_valida):
     print("\n>> Valor da Engenharia de Dados: O pipeline de limpeza foi essencial para garantir a confiabilidade dos relatórios.")
     print(f"   Sem este tratamento, apenas uma fração dos {num_limpos} registros válidos seria aproveitável, levando a conclusões de negócio imprecisas.")
 
+    relatorios['qualidade'] = {
+        'registros_validos_entrada': contagem_inicial_valida,
+        'registros_rejeitados': num_rejeitados,
+        'registros_limpos': num_limpos,
+    }
+    return relatorios
+
+
+# Limite de linhas de uma aba do Excel (incluindo o cabeçalho)
+MAX_LINHAS_ABA_EXCEL = 1_048_576
+
+BORDA_CABECALHO = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+
+def _bloco_para_excel(bloco, colunas_data=()):
+    """Prepara um bloco de linhas para o openpyxl: `colunas_data` como 'dd/mm/aaaa' e vazios como None."""
+    colunas = {}
+    for col in bloco.columns:
+        serie = bloco[col]
+        if col in colunas_data:
+            serie = serie.dt.strftime('%d/%m/%Y')
+        colunas[col] = serie.astype(object).where(serie.notna(), None)
+    return pd.DataFrame(colunas, index=bloco.index)
+
+def _larguras_colunas(df, linhas_por_lote, colunas_data=()):
+    """
+    Calcula a largura de cada coluna como o antigo auto-ajuste: maior `len(str(valor))`
+    entre cabeçalho e células, mais 2.
+
+    Os tamanhos vêm das colunas originais, sem formatar os blocos: vazios contam 0 (o
+    pandas os gravava como ''), datas de `colunas_data` têm sempre 10 caracteres
+    ('dd/mm/aaaa') e as demais datas, 19 ('aaaa-mm-dd hh:mm:ss').
+    """
+    larguras = [len(str(col)) for col in df.columns]
+    for inicio in range(0, len(df), linhas_por_lote):
+        bloco = df.iloc[inicio:inicio + linhas_por_lote]
+        for posicao, col in enumerate(bloco.columns):
+            serie = bloco[col]
+            preenchidos = serie.notna()
+            if not preenchidos.any():
+                continue
+            if col in colunas_data:
+                maior = 10
+            elif pd.api.types.is_datetime64_any_dtype(serie):
+                maior = 19
+            else:
+                maior = int(serie[preenchidos].astype(str).str.len().max())
+            larguras[posicao] = max(larguras[posicao], maior)
+    return [largura + 2 for largura in larguras]
+
+@etapa
+def _escrever_aba(workbook, df, nome_aba, linhas_por_lote, colunas_data=()):
+    """
+    Escreve o DataFrame em abas de modo write-only, bloco a bloco.
 
-def salvar_dados_limpos(df_limpo, df_rejeitados, caminho_saida):
+    Se as linhas não couberem em uma aba, continua em 'nome_aba_2', 'nome_aba_3', ...
+    """
+    larguras = _larguras_colunas(df, linhas_por_lote, colunas_data)
+    linhas_por_aba = MAX_LINHAS_ABA_EXCEL - 1
+    total_abas = max(1, -(-len(df) // linhas_por_aba))
+
+    for numero_aba in range(total_abas):
+        titulo = nome_aba if numero_aba == 0 else f"{nome_aba}_{numero_aba + 1}"
+        aba = workbook.create_sheet(title=titulo)
+        # No modo write-only, as larguras precisam ser definidas antes da primeira linha
+        for posicao, largura in enumerate(larguras, start=1):
+            aba.column_dimensions[get_column_letter(posicao)].width = largura
+
+        # Mesmo estilo de cabeçalho do `DataFrame.to_excel`
+        cabecalho = []
+        for col in df.columns:
+            celula = WriteOnlyCell(aba, value=str(col))
+            celula.font = Font(bold=True)
+            celula.alignment = Alignment(horizontal='center', vertical='top')
+            celula.border = BORDA_CABECALHO
+            cabecalho.append(celula)
+        aba.append(cabecalho)
+
+        inicio_aba = numero_aba * linhas_por_aba
+        fim_aba = min(inicio_aba + linhas_por_aba, len(df))
+        for inicio in range(inicio_aba, fim_aba, linhas_por_lote):
+            bloco = _bloco_para_excel(df.iloc[inicio:min(inicio + linhas_por_lote, fim_aba)], colunas_data)
+            for linha in bloco.itertuples(index=False, name=None):
+                aba.append(linha)
+
+@etapa
+def salvar_dados_limpos(df_limpo, df_rejeitados, caminho_saida, linhas_por_lote=50000):
     """
     Salva os DataFrames de dados limpos e rejeitados em um único arquivo Excel, 
     com abas distintas para facilitar a auditoria.
+
+    A escrita usa o modo write-only do openpyxl, que grava as linhas em disco à medida
+    que são adicionadas; com os dados formatados em blocos de `linhas_por_lote`, a
+    memória extra fica limitada independentemente do número de linhas.
     """
     print(f"\nSalvando arquivo de dados limpos e removidos em: {caminho_saida}...")
     try:
-        with pd.ExcelWriter(caminho_saida, engine='openpyxl') as writer:
-            df_limpo_para_salvar = df_limpo.copy()
-            if 'Data' in df_limpo_para_salvar.columns:
-                df_limpo_para_salvar['Data'] = df_limpo_para_salvar['Data'].dt.strftime('%d/%m/%Y')
-            df_limpo_para_salvar.to_excel(writer, index=False, sheet_name='Dados_Limpos')
-            
-            if not df_rejeitados.empty:
-                df_rejeitados.to_excel(writer, index=False, sheet_name='Dados_Removidos')
-
-            # Auto-ajuste da largura das colunas para melhor visualização.
-            for sheet_name in writer.sheets:
-                worksheet = writer.sheets[sheet_name]
-                for column in worksheet.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    worksheet.column_dimensions[column_letter].width = (max_length + 2)
+        workbook = Workbook(write_only=True)
+        _escrever_aba(workbook, df_limpo, 'Dados_Limpos', linhas_por_lote, colunas_data=('Data',))
+        if not df_rejeitados.empty:
+            _escrever_aba(workbook, df_rejeitados, 'Dados_Removidos', linhas_por_lote)
+        workbook.save(caminho_saida)
 
         print("-> Arquivo salvo com sucesso!")
     except Exception as e:
         print(f"ERRO ao salvar o arquivo: {e}")
 
+# Tamanho padrão dos blocos do modo out-of-core
+LINHAS_POR_BLOCO = 250_000
+
+# Colunas fixas das saídas em blocos, para que todos os blocos tenham o mesmo esquema
+COLUNAS_LIMPOS = ['Data', 'Mes', 'Ano', 'SKU', 'NomeProduto', 'Investido', 'Cliques', 'Receita', 'Conversões']
+COLUNAS_REJEITADOS = COLUNAS_BASE + ['Ano_Final', 'Mes_Final', 'Motivo_Remocao']
+
+def ler_base_em_blocos(caminho_arquivo, linhas_por_bloco=LINHAS_POR_BLOCO):
+    """
+    Lê a base de vendas (CSV ou Parquet) em blocos de `linhas_por_bloco` linhas.
+
+    Apenas as colunas usadas pela limpeza são lidas. As de texto são normalizadas
+    como na leitura do Excel, e o índice segue a numeração global das linhas.
+    """
+    extensao = os.path.splitext(caminho_arquivo)[1].lower()
+    if extensao == '.csv':
+        blocos = pd.read_csv(
+            caminho_arquivo, chunksize=linhas_por_bloco, usecols=lambda col: col in COLUNAS_BASE,
+            dtype={col: object for col in COLUNAS_TEXTO_BASE},
+        )
+    elif extensao == '.parquet':
+        arquivo = pq.ParquetFile(caminho_arquivo)
+        colunas = [col for col in COLUNAS_BASE if col in arquivo.schema_arrow.names]
+        blocos = (lote.to_pandas() for lote in arquivo.iter_batches(batch_size=linhas_por_bloco, columns=colunas))
+    else:
+        raise ValueError(f"Formato não suportado no modo em blocos: '{caminho_arquivo}' (use .csv ou .parquet).")
+
+    inicio = 0
+    for bloco in blocos:
+        bloco.index = pd.RangeIndex(inicio, inicio + len(bloco))
+        inicio += len(bloco)
+        for col in COLUNAS_TEXTO_BASE:
+            if col in bloco.columns:
+                bloco[col] = _normalizar_texto(bloco[col])
+        yield bloco
+
+@etapa
+def carregar_catalogo(caminho_arquivo):
+    """Lê apenas a tabela de SKUs, de uma planilha (aba 'SKUS'), de um CSV ou de um Parquet."""
+    extensao = os.path.splitext(caminho_arquivo)[1].lower()
+    if extensao == '.csv':
+        return pd.read_csv(caminho_arquivo, usecols=COLUNAS_SKUS)
+    if extensao == '.parquet':
+        return pd.read_parquet(caminho_arquivo, columns=COLUNAS_SKUS)
+    with pd.ExcelFile(caminho_arquivo, engine=MOTOR_EXCEL) as planilha:
+        return planilha.parse('SKUS', usecols=COLUNAS_SKUS)
+
+class EscritorEmBlocos:
+    """
+    Grava blocos de um DataFrame, um após o outro, em CSV ou Parquet (conforme a extensão).
+
+    O CSV recebe o cabeçalho só no primeiro bloco; no Parquet o esquema do primeiro
+    bloco é fixado e os seguintes são convertidos para ele.
+    """
+
+    def __init__(self, caminho_arquivo):
+        self.caminho_arquivo = caminho_arquivo
+        self.parquet = os.path.splitext(caminho_arquivo)[1].lower() == '.parquet'
+        self.linhas = 0
+        self._arquivo = None
+        self._esquema = None
+
+    def escrever(self, df):
+        if self.parquet:
+            if self._arquivo is None:
+                tabela = pa.Table.from_pandas(df, preserve_index=False)
+                self._esquema = tabela.schema
+                self._arquivo = pq.ParquetWriter(self.caminho_arquivo, self._esquema)
+            else:
+                tabela = pa.Table.from_pandas(df, schema=self._esquema, preserve_index=False)
+            self._arquivo.write_table(tabela)
+        else:
+            if self._arquivo is None:
+                self._arquivo = open(self.caminho_arquivo, 'w', newline='', encoding='utf-8')
+            df.to_csv(self._arquivo, header=self.linhas == 0, index=False)
+        self.linhas += len(df)
+
+    def fechar(self):
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+def _padronizar_limpos(df_limpo, catalogo):
+    """Fixa tipos que podem variar entre blocos: medidas em float64 e SKU no tipo decidido pelo catálogo."""
+    df = df_limpo.reindex(columns=COLUNAS_LIMPOS)
+    df[['Investido', 'Cliques', 'Receita', 'Conversões']] = df[['Investido', 'Cliques', 'Receita', 'Conversões']].astype('float64')
+    if catalogo.sku_inteiro:
+        df['SKU'] = pd.to_numeric(df['SKU']).astype('int64')
+    else:
+        df['SKU'] = df['SKU'].astype(str)
+    return df
+
+def _padronizar_rejeitados(df_rejeitados):
+    """Leva os rejeitados para as colunas fixas, todas em texto (vazios preservados)."""
+    df = df_rejeitados.reindex(columns=COLUNAS_REJEITADOS)
+    for col in df.columns:
+        df[col] = df[col].astype(object).where(df[col].notna(), None)
+        df[col] = df[col].map(lambda valor: valor if valor is None else str(valor))
+    return df
+
+def _somar_cubos(cubo_acumulado, cubo_bloco):
+    """Combina dois cubos agregados, somando as medidas das mesmas chaves."""
+    if cubo_acumulado is None:
+        return cubo_bloco
+    chaves = [col for col in ['Ano', 'Mes', 'SKU', 'NomeProduto'] if col in cubo_bloco.columns]
+    return pd.concat([cubo_acumulado, cubo_bloco], ignore_index=True).groupby(chaves, sort=True).sum().reset_index()
+
+@etapa(linhas_saida=lambda resultado: resultado['num_limpos'])
+def limpar_em_blocos(caminho_base, caminho_skus, caminho_limpos, caminho_rejeitados, linhas_por_bloco=LINHAS_POR_BLOCO,
+                     diretorio_correcoes=None):
+    """
+    Modo out-of-core: limpa uma base de vendas grande (CSV ou Parquet) bloco a bloco.
+
+    O catálogo e o índice de n-gramas são preparados uma vez, e as correções de nomes
+    já decididas são reaproveitadas entre os blocos. Com `diretorio_correcoes`, elas
+    também vêm de (e voltam para) um `ArmazemCorrecoes`, valendo entre execuções. Cada
+    bloco limpo e rejeitado é gravado assim que processado; em memória ficam só o cubo
+    agregado e as contagens.
+
+    Returns:
+        dict: 'cubo' agregado, 'contagem_inicial' (linhas válidas após a limpeza
+        inicial), 'num_limpos', 'num_rejeitados' e 'rejeicoes_por_motivo'.
+    """
+    print("\nIniciando o pipeline de limpeza em blocos...")
+    catalogo = CatalogoSKU(carregar_catalogo(caminho_skus))
+    armazem = ArmazemCorrecoes(diretorio_correcoes, catalogo.chave_correcoes) if diretorio_correcoes else None
+    mapa_correcoes = armazem.mapa if armazem else {}
+    cubo = None
+    contagem_inicial = 0
+    rejeicoes_por_motivo = pd.Series(0, index=MOTIVOS_REJEICAO, dtype='int64')
+
+    with EscritorEmBlocos(caminho_limpos) as limpos, EscritorEmBlocos(caminho_rejeitados) as rejeitados:
+        for numero, df_bloco in enumerate(ler_base_em_blocos(caminho_base, linhas_por_bloco), start=1):
+            df_limpo, df_rejeitados, contagem_bloco = limpar_bloco(df_bloco, catalogo, mapa_correcoes)
+            contagem_inicial += contagem_bloco
+            if not df_rejeitados.empty:
+                rejeicoes_por_motivo = rejeicoes_por_motivo.add(
+                    df_rejeitados['Motivo_Remocao'].value_counts(), fill_value=0
+                ).astype('int64')
+
+            if not df_limpo.empty:
+                df_limpo = _padronizar_limpos(df_limpo, catalogo)
+                limpos.escrever(df_limpo)
+                cubo = _somar_cubos(cubo, construir_cubo_agregado(df_limpo))
+            if not df_rejeitados.empty:
+                rejeitados.escrever(_padronizar_rejeitados(df_rejeitados))
+            print(f"Bloco {numero}: {len(df_limpo)} linhas limpas, {len(df_rejeitados)} rejeitadas.")
+
+    if armazem:
+        armazem.salvar()
+    print("\nLimpeza de dados concluída!")
+    return {
+        'cubo': cubo,
+        'contagem_inicial': contagem_inicial,
+        'num_limpos': limpos.linhas,
+        'num_rejeitados': rejeitados.linhas,
+        'rejeicoes_por_motivo': rejeicoes_por_motivo[rejeicoes_por_motivo > 0],
+    }
+
+# Estado de cada processo do lote: catálogo compartilhado (se houver) e suas correções
+# guardadas, diretório do armazém de correções e catálogos já preparados, por hash, com as
+# respectivas correções de nomes acumuladas
+_CATALOGO_LOTE = None
+_CORRECOES_LOTE = None
+_DIRETORIO_CORRECOES_LOTE = None
+_CATALOGOS_PREPARADOS = {}
+
+def _iniciar_processo_lote(catalogo, mapa_correcoes=None, diretorio_correcoes=None, estado_metricas=None):
+    """
+    Inicializador do pool: recebe o catálogo já preparado pelo processo principal, com as
+    correções guardadas dele, o diretório do armazém de correções (apenas para leitura) e
+    a configuração das métricas.
+    """
+    global _CATALOGO_LOTE, _CORRECOES_LOTE, _DIRETORIO_CORRECOES_LOTE
+    METRICAS.configurar_processo(estado_metricas)
+    _CATALOGO_LOTE = catalogo
+    _CORRECOES_LOTE = mapa_correcoes
+    _DIRETORIO_CORRECOES_LOTE = diretorio_correcoes
+
+def _catalogo_para(df_skus):
+    """Retorna o catálogo e o mapa de correções do processo atual para esta tabela de SKUs."""
+    if _CATALOGO_LOTE is not None:
+        chave = 'compartilhado'
+        if chave not in _CATALOGOS_PREPARADOS:
+            _CATALOGOS_PREPARADOS[chave] = (_CATALOGO_LOTE, dict(_CORRECOES_LOTE or {}))
+        return _CATALOGOS_PREPARADOS[chave]
+    chave = _hash_tabela(df_skus[COLUNAS_SKUS])
+    if chave not in _CATALOGOS_PREPARADOS:
+        catalogo = CatalogoSKU(df_skus)
+        # O processo só lê o armazém; as decisões novas voltam ao processo principal, que as grava
+        mapa_correcoes = {}
+        if _DIRETORIO_CORRECOES_LOTE:
+            mapa_correcoes = ArmazemCorrecoes(_DIRETORIO_CORRECOES_LOTE, catalogo.chave_correcoes).mapa
+        _CATALOGOS_PREPARADOS[chave] = (catalogo, mapa_correcoes)
+    return _CATALOGOS_PREPARADOS[chave]
+
+def _raiz_lote(entrada):
+    """Diretório a partir do qual os arquivos do lote são identificados: o próprio diretório ou a parte fixa do glob."""
+    if os.path.isdir(entrada):
+        return entrada
+    partes = os.path.normpath(entrada).split(os.sep)
+    fixas = []
+    for parte in partes[:-1]:
+        if glob.has_magic(parte):
+            break
+        fixas.append(parte)
+    return os.sep.join(fixas) or (os.sep if os.path.isabs(entrada) else os.curdir)
+
+def identificar_arquivo_lote(caminho_arquivo, raiz):
+    """
+    Identifica um arquivo do lote pelo caminho relativo à raiz do lote, com '/' como separador.
+
+    Planilhas de mesmo nome em pastas diferentes (por exemplo, uma por cliente em
+    'clientes/*/ObjetosTeca.xlsx') recebem identificadores e saídas distintos.
+    """
+    return os.path.relpath(caminho_arquivo, raiz).replace(os.sep, '/')
+
+def _saidas_do_arquivo(identificador, diretorio_saida):
+    """Caminhos das saídas de um arquivo do lote, com as pastas do identificador: planilha limpa e Parquets da consolidação."""
+    prefixo = os.path.join(diretorio_saida, *os.path.splitext(identificador)[0].split('/'))
+    return {
+        'excel': f'{prefixo}_Limpo.xlsx',
+        'limpos': f'{prefixo}_limpos.parquet',
+        'rejeitados': f'{prefixo}_rejeitados.parquet',
+    }
+
+def _saidas_atualizadas(caminho_arquivo, saidas, dependencias=()):
+    """Indica se todas as saídas existem e são mais novas que o arquivo e suas dependências."""
+    if not all(os.path.exists(caminho) for caminho in saidas.values()):
+        return False
+    mais_recente = max(os.path.getmtime(caminho) for caminho in (caminho_arquivo, *dependencias))
+    return min(os.path.getmtime(caminho) for caminho in saidas.values()) >= mais_recente
+
+@etapa
+def _processar_arquivo_lote(caminho_arquivo, identificador, diretorio_saida):
+    """Limpa um arquivo do lote (executado em um processo do pool) e grava suas saídas."""
+    saidas = _saidas_do_arquivo(identificador, diretorio_saida)
+    os.makedirs(os.path.dirname(saidas['excel']), exist_ok=True)
+    df_base, df_skus = carregar_dados_excel(caminho_arquivo)
+    if df_base is None:
+        return {'arquivo': caminho_arquivo, 'erro': True}
+
+    catalogo, mapa_correcoes = _catalogo_para(df_skus)
+    ja_decididos = len(mapa_correcoes)
+    df_limpo, df_rejeitados, contagem_inicial = limpar_bloco(df_base, catalogo, mapa_correcoes)
+
+    salvar_dados_limpos(df_limpo, df_rejeitados, saidas['excel'])
+    _padronizar_limpos(df_limpo, catalogo).to_parquet(saidas['limpos'], index=False)
+    _padronizar_rejeitados(df_rejeitados).to_parquet(saidas['rejeitados'], index=False)
+    return {
+        'arquivo': caminho_arquivo, 'erro': False, 'contagem_inicial': contagem_inicial,
+        # Decisões de fuzzy matching tomadas neste arquivo (o dicionário preserva a ordem de inserção)
+        'chave_correcoes': catalogo.chave_correcoes,
+        'correcoes': dict(list(mapa_correcoes.items())[ja_decididos:]),
+    }
+
+def _executar_arquivo_lote(caminho_arquivo, identificador, diretorio_saida):
+    """Tarefa do pool: processa o arquivo e devolve, junto do resultado, as métricas do processo."""
+    resultado = _processar_arquivo_lote(caminho_arquivo, identificador, diretorio_saida)
+    if METRICAS.ativa:
+        resultado['metricas'] = METRICAS.extrair_medicoes()
+    return resultado
+
+def listar_arquivos_lote(entrada):
+    """
+    Lista as planilhas de um lote: todos os .xlsx de um diretório ou os arquivos de um glob.
+
+    Arquivos temporários do Excel ('~$...') e saídas '_Limpo.xlsx' são ignorados.
+    """
+    padrao = os.path.join(entrada, '*.xlsx') if os.path.isdir(entrada) else entrada
+    arquivos = []
+    for caminho in sorted(glob.glob(padrao)):
+        nome = os.path.basename(caminho)
+        if nome.startswith('~$') or nome.endswith('_Limpo.xlsx'):
+            continue
+        arquivos.append(caminho)
+    return arquivos
+
+@etapa(linhas_saida=lambda resultado: len(resultado['processados']))
+def processar_lote(entrada, diretorio_saida, caminho_catalogo=None, max_workers=None, forcar=False, diretorio_correcoes=None):
+    """
+    Limpa em paralelo todas as planilhas de um diretório ou glob.
+
+    Cada arquivo é identificado pelo caminho relativo ao diretório ou à parte fixa do
+    glob (veja `identificar_arquivo_lote`); suas saídas repetem essas pastas dentro de
+    `diretorio_saida` e o identificador vai para a coluna 'Arquivo' dos consolidados.
+    Cada arquivo gera sua planilha '_Limpo.xlsx' e, a partir das saídas de todos os
+    arquivos, são gravados o dataset limpo consolidado ('consolidado_limpos.parquet'),
+    os rejeitados consolidados ('consolidado_rejeitados.parquet') e um relatório de
+    rejeições por arquivo e motivo ('relatorio_rejeicoes.csv'). Arquivos cujas saídas
+    são mais novas que a planilha (e que o catálogo) são pulados, salvo com `forcar`.
+
+    Os processos são iniciados com 'spawn', então um script que chame esta função
+    precisa do guarda `if __name__ == "__main__":`. Com as métricas ligadas, as etapas
+    de cada processo entram no resumo do processo principal.
+
+    Args:
+        entrada (str): Diretório com as planilhas ou padrão glob.
+        diretorio_saida (str): Diretório das saídas por arquivo e consolidadas.
+        caminho_catalogo (str, optional): Tabela de SKUs comum a todos os arquivos; é
+            preparada uma única vez e enviada a cada processo. Sem ela, cada arquivo usa
+            a própria aba 'SKUS', e catálogos iguais são preparados uma vez por processo.
+        max_workers (int, optional): Número de processos; padrão, os núcleos disponíveis.
+        forcar (bool): Reprocessa mesmo os arquivos com saídas atualizadas.
+        diretorio_correcoes (str, optional): Diretório dos `ArmazemCorrecoes`. Os processos
+            partem das correções guardadas e as novas decisões são gravadas ao final do lote.
+
+    Returns:
+        dict: 'processados', 'pulados' e 'com_erro' (listas de arquivos) e o relatório de
+        rejeições consolidado ('rejeicoes').
+    """
+    arquivos = listar_arquivos_lote(entrada)
+    print(f"\nProcessamento em lote: {len(arquivos)} arquivo(s) encontrado(s) em '{entrada}'.")
+    os.makedirs(diretorio_saida, exist_ok=True)
+    raiz = _raiz_lote(entrada)
+    identificadores = {caminho: identificar_arquivo_lote(caminho, raiz) for caminho in arquivos}
+
+    dependencias = (caminho_catalogo,) if caminho_catalogo else ()
+    pendentes = [
+        caminho for caminho in arquivos
+        if forcar or not _saidas_atualizadas(caminho, _saidas_do_arquivo(identificadores[caminho], diretorio_saida), dependencias)
+    ]
+    pulados = [caminho for caminho in arquivos if caminho not in pendentes]
+    for caminho in pulados:
+        print(f"-> {identificadores[caminho]}: saídas atualizadas, arquivo pulado.")
+
+    catalogo = CatalogoSKU(carregar_catalogo(caminho_catalogo)) if caminho_catalogo else None
+    armazens = {}
+    if catalogo is not None and diretorio_correcoes:
+        armazens[catalogo.chave_correcoes] = ArmazemCorrecoes(diretorio_correcoes, catalogo.chave_correcoes)
+    mapa_compartilhado = armazens[catalogo.chave_correcoes].mapa if armazens else None
+
+    resultados = []
+    if pendentes:
+        max_workers = min(max_workers or os.cpu_count() or 1, len(pendentes))
+        # 'spawn' em todas as plataformas: um fork copiaria travas seguradas por threads do
+        # processo principal (amostragem de memória, pools do Arrow e do rapidfuzz)
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_iniciar_processo_lote,
+                                 initargs=(catalogo, mapa_compartilhado, diretorio_correcoes, METRICAS.estado_para_processo())) as executor:
+            futuros = [
+                executor.submit(_executar_arquivo_lote, caminho, identificadores[caminho], diretorio_saida)
+                for caminho in pendentes
+            ]
+            for caminho, futuro in zip(pendentes, futuros):
+                # Uma falha em um arquivo não interrompe o lote: o arquivo fica fora da consolidação
+                try:
+                    resultados.append(futuro.result())
+                    METRICAS.incorporar(resultados[-1].pop('metricas', None))
+                except Exception as e:
+                    print(f"ERRO ao processar o arquivo '{identificadores[caminho]}': {e}")
+                    resultados.append({'arquivo': caminho, 'erro': True})
+
+    # As decisões novas de cada processo vão para o armazém do catálogo correspondente
+    if diretorio_correcoes:
+        for resultado in resultados:
+            if resultado.get('correcoes'):
+                chave = resultado['chave_correcoes']
+                if chave not in armazens:
+                    armazens[chave] = ArmazemCorrecoes(diretorio_correcoes, chave)
+                armazens[chave].mapa.update(resultado['correcoes'])
+        for armazem in armazens.values():
+            armazem.salvar()
+
+    com_erro = [r['arquivo'] for r in resultados if r['erro']]
+    validos = [caminho for caminho in arquivos if caminho not in com_erro]
+
+    # CONSOLIDAÇÃO: junta as saídas de todos os arquivos, inclusive dos pulados
+    limpos, rejeitados = [], []
+    for caminho in validos:
+        saidas = _saidas_do_arquivo(identificadores[caminho], diretorio_saida)
+        limpos.append(pd.read_parquet(saidas['limpos']).assign(Arquivo=identificadores[caminho]))
+        rejeitados.append(pd.read_parquet(saidas['rejeitados']).assign(Arquivo=identificadores[caminho]))
+
+    relatorio = pd.DataFrame(columns=['Arquivo', 'Motivo_Remocao', 'Quantidade'])
+    if validos:
+        pd.concat(limpos, ignore_index=True).to_parquet(os.path.join(diretorio_saida, 'consolidado_limpos.parquet'), index=False)
+        df_rejeitados = pd.concat(rejeitados, ignore_index=True)
+        df_rejeitados.to_parquet(os.path.join(diretorio_saida, 'consolidado_rejeitados.parquet'), index=False)
+        relatorio = df_rejeitados.groupby(['Arquivo', 'Motivo_Remocao']).size().rename('Quantidade').reset_index()
+    relatorio.to_csv(os.path.join(diretorio_saida, 'relatorio_rejeicoes.csv'), index=False)
+
+    print(f"\nLote concluído: {len(resultados) - len(com_erro)} processado(s), {len(pulados)} pulado(s), {len(com_erro)} com erro.")
+    return {
+        'processados': [r['arquivo'] for r in resultados if not r['erro']],
+        'pulados': pulados,
+        'com_erro': com_erro,
+        'rejeicoes': relatorio,
+    }
+
 def main():
     """Função principal que orquestra o fluxo: carregar, limpar e analisar os dados."""
     ARQUIVO_ENTRADA = 'ObjetosTeca.xlsx'
     ARQUIVO_SAIDA = 'ObjetosTeca_Limpo.xlsx'
+
+    # Bases grandes (CSV/Parquet) são processadas em blocos, sem carregar tudo na memória
+    ARQUIVO_BASE_GRANDE = None
+    SAIDA_LIMPOS_BLOCOS = 'ObjetosTeca_Limpo.parquet'
+    SAIDA_REJEITADOS_BLOCOS = 'ObjetosTeca_Rejeitados.parquet'
+
+    # Lote de planilhas (diretório ou glob), processado em paralelo
+    ENTRADA_LOTE = None
+    DIRETORIO_SAIDA_LOTE = 'saida_lote'
+    CATALOGO_LOTE = None
+
+    # Estado entre execuções: só as linhas novas da planilha são processadas, e as correções
+    # de nomes já decididas valem também para os modos em blocos e em lote (None desliga)
+    DIRETORIO_ESTADO = '.estado_limpeza'
+
+    if ENTRADA_LOTE:
+        processar_lote(ENTRADA_LOTE, DIRETORIO_SAIDA_LOTE, caminho_catalogo=CATALOGO_LOTE, diretorio_correcoes=DIRETORIO_ESTADO)
+        return
+
+    if ARQUIVO_BASE_GRANDE:
+        resultado = limpar_em_blocos(
+            ARQUIVO_BASE_GRANDE, ARQUIVO_ENTRADA, SAIDA_LIMPOS_BLOCOS, SAIDA_REJEITADOS_BLOCOS,
+            diretorio_correcoes=DIRETORIO_ESTADO
+        )
+        if resultado['num_rejeitados']:
+            print("\n--- RELATÓRIO DE DADOS REMOVIDOS (por motivo) ---")
+            print(resultado['rejeicoes_por_motivo'].to_string())
+        if resultado['cubo'] is not None:
+            analisar_dados(None, None, resultado['contagem_inicial'], cubo=resultado['cubo'], num_rejeitados=resultado['num_rejeitados'])
+        else:
+            print("\nProcesso interrompido, pois não restaram dados após a limpeza.")
+        return
     
-    df_base, df_skus = carregar_dados_excel(ARQUIVO_ENTRADA)
-    
-    if df_base is not None and df_skus is not None:
-        df_limpo, df_rejeitados, contagem_inicial = limpar_e_unificar_dados(df_base, df_skus)
-        
+    if DIRETORIO_ESTADO:
+        df_limpo, df_rejeitados, contagem_inicial = limpar_incremental(ARQUIVO_ENTRADA, DIRETORIO_ESTADO)
+    else:
+        df_limpo = None
+        df_base, df_skus = carregar_dados_excel(ARQUIVO_ENTRADA)
+        if df_base is not None and df_skus is not None:
+            df_limpo, df_rejeitados, contagem_inicial = limpar_e_unificar_dados(df_base, df_skus)
+
+    if df_limpo is not None:
         if not df_rejeitados.empty:
             print("\n--- RELATÓRIO DE DADOS REMOVIDOS ---")
             colunas_relevantes = ['Data', 'Mês', 'Ano', 'Objeto', 'Motivo_Remocao']
@@ -261,4 +1432,9 @@ def main():
             print("\nProcesso interrompido, pois não restaram dados após a limpeza.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Métricas por etapa (e o cProfile) são ligadas pelas variáveis METRICAS_ARQUIVO e METRICAS_PERFIL
+    METRICAS.configurar_pelo_ambiente()
+    try:
+        main()
+    finally:
+        METRICAS.finalizar()
\ No newline at end of file
@@ -0,0 +1,130 @@
+"""
+Testes da carga no Google Sheets (modos 'substituir' e 'incremental') contra o cliente
+gspread local de `benchmarks/fakes.py`, sem rede nem credenciais.
+
+Uso:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'Etl_yahoofinance'))
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+
+import etl_finance  # noqa: E402
+from fakes import ClienteGspreadFalso  # noqa: E402
+
+ID_PLANILHA = 'planilha-teste'
+NOME_ABA = 'Cotacoes'
+CABECALHO = ['data', 'codigo_acao', 'preco_fechamento']
+
+
+def _cotacoes(linhas):
+    return pd.DataFrame(linhas, columns=CABECALHO).assign(data=lambda df: pd.to_datetime(df['data']))
+
+
+def _carregar(cliente, df, modo, max_celulas_por_requisicao=6):
+    # 6 células por requisição = 2 linhas de 3 colunas, para exercitar o envio em lotes
+    return etl_finance.carregar_para_gsheets(
+        df, NOME_ABA, ID_PLANILHA, None, modo=modo,
+        max_celulas_por_requisicao=max_celulas_por_requisicao, cliente=cliente,
+    )
+
+
+def _aba(cliente):
+    return cliente.open_by_key(ID_PLANILHA).worksheet(NOME_ABA)
+
+
+def _carga_inicial():
+    cliente = ClienteGspreadFalso()
+    df = _cotacoes([
+        ('2024-01-02', 'AAPL', 185.5),
+        ('2024-01-02', 'MSFT', 370.0),
+        ('2024-01-03', 'AAPL', 184.25),
+    ])
+    assert _carregar(cliente, df, 'substituir')
+    return cliente, df
+
+
+def test_substituir_grava_cabecalho_e_todas_as_linhas():
+    cliente, _ = _carga_inicial()
+    aba = _aba(cliente)
+
+    assert aba.get_all_values() == [
+        CABECALHO,
+        ['2024-01-02', 'AAPL', '185.5'],
+        ['2024-01-02', 'MSFT', '370.0'],
+        ['2024-01-03', 'AAPL', '184.25'],
+    ]
+    assert aba.row_count == 4
+
+
+def test_incremental_atualiza_no_lugar_e_anexa_linhas_novas():
+    cliente, df = _carga_inicial()
+    aba = _aba(cliente)
+    celulas_antes = aba.celulas_enviadas
+
+    # Uma linha alterada (MSFT em 02/01), uma inalterada e três novas
+    df_novo = pd.concat([df, _cotacoes([
+        ('2024-01-03', 'MSFT', 371.0),
+        ('2024-01-04', 'AAPL', 186.0),
+        ('2024-01-04', 'MSFT', 372.5),
+    ])], ignore_index=True)
+    df_novo.loc[1, 'preco_fechamento'] = 369.75
+    assert _carregar(cliente, df_novo, 'incremental')
+
+    assert aba.get_all_values() == [
+        CABECALHO,
+        ['2024-01-02', 'AAPL', '185.5'],
+        ['2024-01-02', 'MSFT', '369.75'],
+        ['2024-01-03', 'AAPL', '184.25'],
+        ['2024-01-03', 'MSFT', '371.0'],
+        ['2024-01-04', 'AAPL', '186.0'],
+        ['2024-01-04', 'MSFT', '372.5'],
+    ]
+    # A aba foi redimensionada para caber as linhas anexadas
+    assert aba.row_count == 7
+    # Só a linha alterada e as três novas foram enviadas
+    assert aba.celulas_enviadas - celulas_antes == 4 * len(CABECALHO)
+
+
+def test_incremental_sem_mudancas_nao_envia_celulas():
+    cliente, df = _carga_inicial()
+    aba = _aba(cliente)
+    celulas_antes = aba.celulas_enviadas
+
+    assert _carregar(cliente, df, 'incremental')
+
+    assert aba.celulas_enviadas == celulas_antes
+    assert aba.row_count == 4
+
+
+def test_incremental_com_cabecalho_diferente_recarrega_a_aba():
+    cliente, df = _carga_inicial()
+    aba = _aba(cliente)
+
+    df_novo = df.assign(volume_negociado=[100, 200, 300])
+    assert _carregar(cliente, df_novo, 'incremental')
+
+    assert aba.get_all_values() == [
+        CABECALHO + ['volume_negociado'],
+        ['2024-01-02', 'AAPL', '185.5', '100'],
+        ['2024-01-02', 'MSFT', '370.0', '200'],
+        ['2024-01-03', 'AAPL', '184.25', '300'],
+    ]
+    assert (aba.row_count, aba.col_count) == (4, 4)
+
+
+def test_destino_google_sheets_aceita_cliente():
+    cliente = ClienteGspreadFalso()
+    destino = etl_finance.criar_destino({
+        'tipo': 'gsheets', 'nome_planilha': NOME_ABA, 'id_spreadsheet': ID_PLANILHA, 'cliente': cliente,
+    })
+    df = _cotacoes([('2024-01-02', 'AAPL', 185.5)])
+
+    assert destino.carregar(df)
+    assert _aba(cliente).get_all_values() == [CABECALHO, ['2024-01-02', 'AAPL', '185.5']]
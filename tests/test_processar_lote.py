@@ -0,0 +1,50 @@
+"""
+Testes do processamento em lote da limpeza (`processar_lote`) com planilhas geradas por
+`benchmarks/gerador_planilhas.py`.
+
+Uso:
+    python -m pytest tests
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, 'limpeza_dados'))
+sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+
+import limpeza  # noqa: E402
+from gerador_planilhas import gerar_planilha  # noqa: E402
+
+
+def _esperado(caminho_arquivo):
+    """Resultado do processamento normal de uma planilha, para comparar com o lote."""
+    df_base, df_skus = limpeza.carregar_dados_excel(caminho_arquivo, usar_cache=False)
+    df_limpo, df_rejeitados, _ = limpeza.limpar_e_unificar_dados(df_base, df_skus)
+    return len(df_limpo), len(df_rejeitados)
+
+
+def test_planilhas_de_mesmo_nome_em_pastas_diferentes(tmp_path):
+    # Uma planilha por cliente, todas com o mesmo nome e conteúdos diferentes
+    for cliente, num_linhas, semente in (('cliente_a', 300, 1), ('cliente_b', 200, 2)):
+        gerar_planilha(str(tmp_path / 'clientes' / cliente / 'ObjetosTeca.xlsx'), num_linhas, semente=semente)
+    saida = tmp_path / 'saida'
+
+    resultado = limpeza.processar_lote(
+        str(tmp_path / 'clientes' / '*' / 'ObjetosTeca.xlsx'), str(saida), max_workers=2
+    )
+
+    identificadores = ['cliente_a/ObjetosTeca.xlsx', 'cliente_b/ObjetosTeca.xlsx']
+    assert len(resultado['processados']) == 2 and not resultado['com_erro']
+    for cliente in ('cliente_a', 'cliente_b'):
+        assert (saida / cliente / 'ObjetosTeca_Limpo.xlsx').exists()
+
+    limpos = pd.read_parquet(saida / 'consolidado_limpos.parquet')
+    rejeitados = pd.read_parquet(saida / 'consolidado_rejeitados.parquet')
+    for identificador in identificadores:
+        num_limpos, num_rejeitados = _esperado(str(tmp_path / 'clientes' / identificador))
+        assert (limpos['Arquivo'] == identificador).sum() == num_limpos
+        assert (rejeitados['Arquivo'] == identificador).sum() == num_rejeitados
+    assert sorted(resultado['rejeicoes']['Arquivo'].unique()) == identificadores